@@ -0,0 +1,44 @@
+"""Regression tests for urbanicity.h3grid."""
+
+import pytest
+
+shapely = pytest.importorskip("shapely")
+pytest.importorskip("h3")
+pytest.importorskip("pyproj")
+
+from shapely.geometry import MultiPolygon, box  # noqa: E402
+
+from urbanicity.config import POLYFILL_TILE_DEG  # noqa: E402
+from urbanicity.h3grid import (  # noqa: E402
+    _estimate_utm_crs,
+    _tile_polygons,
+    polyfill_boundary,
+)
+
+
+def _island_city() -> MultiPolygon:
+    # Two islands far apart: most bbox tiles between them miss the boundary.
+    span = 4 * POLYFILL_TILE_DEG
+    west = box(-122.40, 47.50, -122.40 + POLYFILL_TILE_DEG / 2, 47.50 + POLYFILL_TILE_DEG / 2)
+    east = box(-122.40 + span, 47.50 + span, -122.40 + span + 0.05, 47.50 + span + 0.05)
+    return MultiPolygon([west, east])
+
+
+def test_tile_polygons_drops_empty_tiles():
+    pieces = _tile_polygons(_island_city(), POLYFILL_TILE_DEG)
+    assert pieces
+    assert not any(p.is_empty for p in pieces)
+    assert all(p.geom_type == "Polygon" for p in pieces)
+
+
+def test_polyfill_multipolygon_larger_than_tile(tmp_path, monkeypatch):
+    monkeypatch.setattr("urbanicity.cache.CACHE_DIR", tmp_path)
+    cells = polyfill_boundary(_island_city(), h3_res=8, buffer_m=0.0, force=True)
+    assert len(cells) > 0
+
+
+def test_estimate_utm_crs_zone_boundary_is_deterministic():
+    # -120° is the 10/11 boundary: the arithmetic puts it in the eastern zone
+    assert _estimate_utm_crs(40.0, -120.0) == "EPSG:32611"
+    assert _estimate_utm_crs(40.0, -121.0) == "EPSG:32610"
+    assert _estimate_utm_crs(-33.9, 18.4) == "EPSG:32734"
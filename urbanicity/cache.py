@@ -0,0 +1,45 @@
+"""
+On-disk cache naming.
+
+Cached artefacts live under ``CACHE_DIR`` and are content-addressed: the file
+name embeds a short digest of everything that determines the artefact (OSM
+query, network type, …) plus the package version, so changing any input or
+upgrading the package yields a fresh cache entry instead of a stale hit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+from urbanicity import __version__
+from urbanicity.config import CACHE_DIR
+
+
+def cache_key(*parts: object) -> str:
+    """Return a short, stable hex digest of *parts* and the package version."""
+    h = hashlib.sha1()
+    for part in (__version__, *parts):
+        if isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(repr(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+
+def cache_path(prefix: str, *parts: object, suffix: str = ".parquet") -> Path:
+    """
+    Return ``CACHE_DIR / f"{prefix}_{cache_key(*parts)}{suffix}"``.
+
+    Parameters
+    ----------
+    prefix:
+        Human-readable stem (e.g. ``"boston_graph"``) so cache files stay
+        recognisable on disk.
+    parts:
+        Values that determine the cached content.
+    suffix:
+        File extension including the leading dot.
+    """
+    return CACHE_DIR / f"{prefix}_{cache_key(*parts)}{suffix}"
@@ -16,19 +16,24 @@ from __future__ import annotations
 
 import argparse
 import logging
+import multiprocessing
+import os
 import sys
-from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 
 from urbanicity.config import (
     ALL_CITY_SLUGS,
+    ALL_CITY_SLUGS_SET,
     CITIES,
     DEFAULT_BUFFER_M,
     DEFAULT_H3_RES,
     DEFAULT_SIGNAL_MODE,
+    DOWNLOAD_WORKERS,
+    GEOMETRY_FORMATS,
     QUANTILE_HIGH,
     QUANTILE_LOW,
 )
-from urbanicity.pipeline import run_city
 
 
 # ---------------------------------------------------------------------------
@@ -41,11 +46,13 @@ def _normalise_slug(raw: str) -> str:
 
 
 def _parse_cities(value: str) -> List[str]:
-    """Parse the --cities argument into a list of canonical slugs."""
-    if value.lower() == "all":
-        return ALL_CITY_SLUGS
-    slugs = [_normalise_slug(s) for s in value.split(",")]
-    unknown = [s for s in slugs if s not in CITIES]
+    """Parse the --cities argument into a de-duplicated list of canonical slugs."""
+    if value.strip().lower() == "all":
+        return list(ALL_CITY_SLUGS)
+    # dict.fromkeys keeps first-seen order; a repeated slug would otherwise
+    # build (and write) the same city twice, concurrently under --jobs.
+    slugs = list(dict.fromkeys(_normalise_slug(s) for s in value.split(",")))
+    unknown = [s for s in slugs if s not in ALL_CITY_SLUGS_SET]
     if unknown:
         raise argparse.ArgumentTypeError(
             f"Unknown city slug(s): {unknown}. "
@@ -176,13 +183,42 @@ def _build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--no_geojson",
         action="store_true",
-        help="Skip GeoJSON output.",
+        help="Skip the hex geometry output (any --format).",
+    )
+    parser.add_argument(
+        "--format",
+        dest="geometry_format",
+        choices=GEOMETRY_FORMATS,
+        default="parquet",
+        help=(
+            "Format of the hex geometry layer: GeoParquet, FlatGeobuf or "
+            "GeoJSON (default: parquet)."
+        ),
     )
     parser.add_argument(
         "--refresh",
         action="store_true",
         help="Re-download OSM data even if cache files exist.",
     )
+    parser.add_argument(
+        "--exact_area",
+        action="store_true",
+        help=(
+            "Measure hex area as the planar area of the projected polygon "
+            "instead of H3's mean hexagon area (debugging aid)."
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        metavar="INT",
+        help=(
+            "Number of cities processed in parallel, one worker process each "
+            "(default: min(#cities, CPU count)). Use 1 for sequential runs "
+            "with deterministic log ordering."
+        ),
+    )
     parser.add_argument(
         "--log_level",
         default="INFO",
@@ -193,20 +229,46 @@ def _build_parser() -> argparse.ArgumentParser:
 
 
 # ---------------------------------------------------------------------------
-# Main
+# Workers
 # ---------------------------------------------------------------------------
 
-def main(argv: Optional[List[str]] = None) -> None:
-    parser = _build_parser()
-    args = parser.parse_args(argv)
-
+def _configure_logging(log_level: str) -> None:
+    """Configure root logging; also used as the worker-process initializer."""
     logging.basicConfig(
-        level=getattr(logging, args.log_level),
+        level=getattr(logging, log_level),
         format="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
         datefmt="%H:%M:%S",
     )
     logging.getLogger("urllib3").setLevel(logging.WARNING)
-    logging.getLogger("fiona").setLevel(logging.WARNING)
+    logging.getLogger("pyogrio").setLevel(logging.WARNING)
+
+
+def _run_city_job(slug: str, run_kwargs: Dict[str, Any]) -> str:
+    """
+    Run one city in a worker process.
+
+    Only the slug is returned: the city GeoDataFrame is already written to
+    disk by ``run_city`` and shipping it back to the parent would just cost
+    a large pickle round-trip.
+    """
+    from urbanicity.pipeline import run_city
+
+    run_city(city=CITIES[slug], **run_kwargs)
+    return slug
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+
+    _configure_logging(args.log_level)
 
     try:
         city_slugs = _parse_cities(args.cities)
@@ -214,10 +276,15 @@ def main(argv: Optional[List[str]] = None) -> None:
         parser.error(str(exc))
         return  # unreachable; keeps type-checker happy
 
+    # Deferred until arguments are valid: the pipeline pulls in the whole
+    # GIS stack (osmnx, geopandas, …), which `--help` and bad input never need.
+    from urbanicity.pipeline import prefetch_city
+
     logger = logging.getLogger(__name__)
+    jobs = args.jobs or min(len(city_slugs), os.cpu_count() or 1)
     logger.info(
         "Pipeline starting | cities=%s | h3_res=%d | signals=%s | "
-        "q_low=%.2f | q_high=%.2f | weights=%s | refresh=%s",
+        "q_low=%.2f | q_high=%.2f | weights=%s | refresh=%s | jobs=%d",
         city_slugs,
         args.h3_res,
         args.signals,
@@ -225,26 +292,72 @@ def main(argv: Optional[List[str]] = None) -> None:
         args.q_high,
         args.weights if args.weights else "default",
         args.refresh,
+        jobs,
+    )
+
+    run_kwargs: Dict[str, Any] = dict(
+        h3_res=args.h3_res,
+        buffer_m=args.buffer_m,
+        signal_mode=args.signals,
+        weights=args.weights,
+        q_low=args.q_low,
+        q_high=args.q_high,
+        emit_geojson=not args.no_geojson,
+        geometry_format=args.geometry_format,
+        force=args.refresh,
+        exact_area=args.exact_area,
     )
 
     failed = []
-    for slug in city_slugs:
-        city = CITIES[slug]
-        try:
-            run_city(
-                city=city,
-                h3_res=args.h3_res,
-                buffer_m=args.buffer_m,
-                signal_mode=args.signals,
-                weights=args.weights,
-                q_low=args.q_low,
-                q_high=args.q_high,
-                emit_geojson=not args.no_geojson,
-                force=args.refresh,
-            )
-        except Exception as exc:
-            logger.error("[%s] Pipeline failed: %s", slug, exc, exc_info=True)
-            failed.append(slug)
+    if jobs == 1:
+        for slug in city_slugs:
+            try:
+                _run_city_job(slug, run_kwargs)
+            except Exception as exc:
+                logger.error("[%s] Pipeline failed: %s", slug, exc, exc_info=True)
+                failed.append(slug)
+    else:
+        # Two-stage pipeline: a few download threads (network-bound, GIL is
+        # released while waiting) warm the on-disk caches city by city, and
+        # each city is handed to the process pool for the CPU-bound H3 and
+        # metric stages as soon as its data is local.  Only slugs cross the
+        # stage boundary; the data itself travels through the cache files.
+        # Workers are spawned rather than forked: forking while download
+        # threads hold locks (logging, sockets) can deadlock the children.
+        # The prefetch already refreshed the downloads; only the cached
+        # cells still need recomputing under --refresh.
+        compute_kwargs = {**run_kwargs, "force": False, "refresh_cells": args.refresh}
+        futures = {}
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_configure_logging,
+            initargs=(args.log_level,),
+        ) as pool, ThreadPoolExecutor(
+            max_workers=min(DOWNLOAD_WORKERS, len(city_slugs)),
+            thread_name_prefix="download",
+        ) as downloader:
+            fetches = {
+                downloader.submit(prefetch_city, CITIES[slug], force=args.refresh): slug
+                for slug in city_slugs
+            }
+            for fetch in as_completed(fetches):
+                slug = fetches[fetch]
+                try:
+                    fetch.result()
+                except Exception as exc:
+                    logger.error("[%s] Download failed: %s", slug, exc, exc_info=True)
+                    failed.append(slug)
+                    continue
+                futures[pool.submit(_run_city_job, slug, compute_kwargs)] = slug
+
+            for future in as_completed(futures):
+                slug = futures[future]
+                try:
+                    future.result()
+                except Exception as exc:
+                    logger.error("[%s] Pipeline failed: %s", slug, exc, exc_info=True)
+                    failed.append(slug)
 
     if failed:
         logger.error("Pipeline completed with failures in: %s", failed)
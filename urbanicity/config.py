@@ -6,7 +6,8 @@ from __future__ import annotations
 
 from pathlib import Path
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Tuple
 
 # ---------------------------------------------------------------------------
 # Paths
@@ -25,6 +26,10 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 DEFAULT_H3_RES: int = 8
 
+# Boundaries wider or taller than this (degrees, ~25 km) are polyfilled tile
+# by tile; see ``h3grid.polyfill_boundary``.
+POLYFILL_TILE_DEG: float = 0.25
+
 # ---------------------------------------------------------------------------
 # OSM network download settings
 # ---------------------------------------------------------------------------
@@ -35,6 +40,17 @@ NETWORK_TYPE: str = "drive"
 # to ensure edge hexes that partially overlap the boundary are included.
 DEFAULT_BUFFER_M: float = 300.0
 
+# Concurrent OSM download threads when cities run in parallel. Kept small:
+# Overpass/Nominatim throttle per client IP, so more threads only queue.
+DOWNLOAD_WORKERS: int = 2
+
+# ---------------------------------------------------------------------------
+# Output formats
+# ---------------------------------------------------------------------------
+
+# Formats for the hex geometry layer (``--format``); see ``io.write_geometry``.
+GEOMETRY_FORMATS: Tuple[str, ...] = ("parquet", "fgb", "geojson")
+
 # ---------------------------------------------------------------------------
 # City definitions
 # ---------------------------------------------------------------------------
@@ -45,7 +61,9 @@ class CityConfig:
     slug: str          # filesystem-safe identifier (underscores)
     osm_query: str     # OSMnx geocode query string
 
-CITIES: Dict[str, CityConfig] = {
+# Read-only view: the city table is a single source of truth and must not be
+# mutated at runtime.  Add new cities by editing this literal.
+CITIES: Mapping[str, CityConfig] = MappingProxyType({
     "seattle": CityConfig(
         name="Seattle",
         slug="seattle",
@@ -71,9 +89,10 @@ CITIES: Dict[str, CityConfig] = {
         slug="boston",
         osm_query="Boston, Massachusetts, USA",
     ),
-}
+})
 
 ALL_CITY_SLUGS: List[str] = list(CITIES.keys())
+ALL_CITY_SLUGS_SET: FrozenSet[str] = frozenset(CITIES)
 
 # ---------------------------------------------------------------------------
 # OSM signal/control tags to query
@@ -159,3 +178,23 @@ OUTPUT_COLUMNS: List[str] = [
     "t_high_q70",
     "field_semantics",
 ]
+
+# Storage dtypes for the finished frame (columns not listed keep their
+# in-memory dtype).  Densities and clamped z-scores carry far less than
+# float32's ~7 significant digits of real information; the band thresholds
+# are downcast with the score so band membership stays reproducible from
+# the stored columns.  Centroid lat/lon stay float64 (~1 m in float32).
+OUTPUT_DTYPES: Dict[str, str] = {
+    "h3_res": "int8",
+    "hex_area_km2": "float32",
+    "intersection_density_per_km2": "float32",
+    "road_density_km_per_km2": "float32",
+    "signal_density_per_km2": "float32",
+    "z_intersection_density": "float32",
+    "z_road_density": "float32",
+    "z_signal_density": "float32",
+    "urbanicity_score_continuous": "float32",
+    "urbanicity_band_3_2_1": "int8",
+    "t_low_q30": "float32",
+    "t_high_q70": "float32",
+}
@@ -2,26 +2,38 @@
 H3 hex grid generation.
 
 Generates a set of H3 cells (at a given resolution) that cover a city
-boundary polygon. Each cell is returned as a polygon in both WGS-84 and
-the city's projected CRS for area / length calculations.
+boundary polygon. Each cell is returned as a polygon in the city's projected
+CRS for area / length calculations; WGS-84 polygons are rebuilt from the cell
+indices on demand (``cells_to_polygons``) for output.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import List, Tuple
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Tuple
 
 import geopandas as gpd
 import h3
-import networkx as nx
 import numpy as np
-import osmnx as ox
 import pandas as pd
-from pyproj import CRS
-from shapely.geometry import MultiPolygon, Point, Polygon, mapping, shape
-from shapely.ops import transform, unary_union
-
-from urbanicity.config import CityConfig, DEFAULT_BUFFER_M, DEFAULT_H3_RES
+import shapely
+from h3.api import numpy_int as h3_int
+from pyproj import CRS, Transformer
+from pyproj.aoi import AreaOfInterest
+from pyproj.database import query_utm_crs_info
+from shapely.geometry import MultiPolygon, Polygon, mapping
+
+from urbanicity.cache import cache_path
+from urbanicity.config import (
+    CityConfig,
+    DEFAULT_BUFFER_M,
+    DEFAULT_H3_RES,
+    POLYFILL_TILE_DEG,
+)
+
+if TYPE_CHECKING:
+    import networkx as nx
 
 logger = logging.getLogger(__name__)
 
@@ -30,13 +42,19 @@ logger = logging.getLogger(__name__)
 # City boundary
 # ---------------------------------------------------------------------------
 
-def get_city_boundary(city: CityConfig, nodes_gdf: gpd.GeoDataFrame) -> Polygon:
+def get_city_boundary(
+    city: CityConfig,
+    nodes_gdf: gpd.GeoDataFrame,
+    force: bool = False,
+) -> Polygon:
     """
     Return a WGS-84 polygon representing the city boundary.
 
     Strategy (in order of preference):
-    1. OSMnx geocoded administrative boundary.
-    2. Convex hull of road-network nodes (fallback).
+    1. Cached administrative boundary (GeoParquet under ``CACHE_DIR``).
+    2. OSMnx geocoded administrative boundary (written to the cache).
+    3. Convex hull of road-network nodes (fallback; never cached, so the
+       geocode is retried on the next run).
 
     Parameters
     ----------
@@ -44,31 +62,46 @@ def get_city_boundary(city: CityConfig, nodes_gdf: gpd.GeoDataFrame) -> Polygon:
         CityConfig for the city.
     nodes_gdf:
         Projected nodes GeoDataFrame (used for convex-hull fallback).
+    force:
+        If True, re-geocode even if a cached boundary exists.
 
     Returns
     -------
     Shapely Polygon in EPSG:4326.
     """
+    cache_file = cache_path(f"{city.slug}_boundary", city.osm_query)
+
+    if cache_file.exists() and not force:
+        logger.info("[%s] Loading boundary from cache: %s", city.slug, cache_file)
+        return gpd.read_parquet(cache_file).geometry.iloc[0]
+
+    # osmnx is only needed on a cache miss and is slow to import
+    import osmnx as ox
+
     try:
         logger.info("[%s] Geocoding administrative boundary…", city.slug)
         boundary_gdf = ox.geocode_to_gdf(city.osm_query)
-        boundary = boundary_gdf.geometry.iloc[0]
         # Ensure WGS-84
         if boundary_gdf.crs and boundary_gdf.crs.to_epsg() != 4326:
             boundary_gdf = boundary_gdf.to_crs("EPSG:4326")
-            boundary = boundary_gdf.geometry.iloc[0]
-        logger.info("[%s] Administrative boundary loaded.", city.slug)
-        return boundary
     except Exception as exc:
         logger.warning(
             "[%s] Admin boundary geocode failed (%s); falling back to convex hull.",
             city.slug,
             exc,
         )
-
-    # Fallback: convex hull of nodes reprojected to WGS-84
-    nodes_wgs84 = nodes_gdf.to_crs("EPSG:4326")
-    hull = nodes_wgs84.geometry.unary_union.convex_hull
+    else:
+        boundary_gdf = boundary_gdf[["geometry"]].iloc[:1]
+        boundary_gdf.to_parquet(cache_file)
+        logger.info("[%s] Administrative boundary loaded and cached.", city.slug)
+        return boundary_gdf.geometry.iloc[0]
+
+    # Fallback: convex hull of nodes.  The hull is taken straight from the
+    # projected coordinate array (no union of Point objects) and only its
+    # handful of vertices are reprojected to WGS-84.
+    coords = shapely.get_coordinates(nodes_gdf.geometry.values)
+    hull = shapely.convex_hull(shapely.multipoints(coords))
+    hull = _reproject(hull, _transformer(nodes_gdf.crs, "EPSG:4326"))
     logger.info("[%s] Using convex hull of nodes as boundary.", city.slug)
     return hull
 
@@ -81,14 +114,19 @@ def polyfill_boundary(
     boundary: Polygon | MultiPolygon,
     h3_res: int = DEFAULT_H3_RES,
     buffer_m: float = DEFAULT_BUFFER_M,
-) -> List[str]:
+    force: bool = False,
+) -> np.ndarray:
     """
-    Return a list of H3 cell indices covering *boundary*.
+    Return the H3 cell indices covering *boundary* as a uint64 array.
 
     A small metric buffer is added (by projecting to UTM, buffering, then
     projecting back) so that edge hexes that partially overlap the boundary
     are included.
 
+    The result is deterministic in (boundary, h3_res, buffer_m) and cached
+    under ``CACHE_DIR`` keyed by the boundary's WKB, so warm runs skip the
+    buffer and polyfill entirely.
+
     Parameters
     ----------
     boundary:
@@ -97,37 +135,51 @@ def polyfill_boundary(
         H3 resolution (default 8).
     buffer_m:
         Buffer in metres applied before polyfilling.
+    force:
+        If True, recompute even if a cached cell list exists.
 
     Returns
     -------
-    List of H3 index strings.
+    Sorted, de-duplicated ``np.uint64`` array of H3 cell indices.
     """
+    cache_file = cache_path("cells", shapely.to_wkb(boundary), h3_res, float(buffer_m))
+    if cache_file.exists() and not force:
+        logger.debug("Loading H3 cells from cache: %s", cache_file)
+        return pd.read_parquet(cache_file)["h3_index"].to_numpy(dtype=np.uint64)
+
     # Buffer: project → buffer → project back
     if buffer_m > 0:
         # Estimate UTM zone from centroid
         centroid = boundary.centroid
         utm_crs = _estimate_utm_crs(centroid.y, centroid.x)
-        from pyproj import Transformer
-        to_utm = Transformer.from_crs("EPSG:4326", utm_crs, always_xy=True)
-        to_wgs = Transformer.from_crs(utm_crs, "EPSG:4326", always_xy=True)
-        buffered_utm = transform(to_utm.transform, boundary).buffer(buffer_m)
-        boundary = transform(to_wgs.transform, buffered_utm)
-
-    cells: set[str] = set()
-
-    # h3 library expects GeoJSON-like dict
-    if isinstance(boundary, MultiPolygon):
-        polygons = list(boundary.geoms)
+        to_utm, to_wgs = _utm_transformers(utm_crs)
+        buffered_utm = _reproject(boundary, to_utm).buffer(buffer_m)
+        boundary = _reproject(buffered_utm, to_wgs)
+
+    # h3 library expects GeoJSON-like dicts, one polygon at a time.  Large
+    # boundaries are cut into bbox tiles first: h3 3.x sizes its polyfill
+    # buffer from each polygon's bounding box, so tiling bounds peak memory
+    # and skips the empty bbox corners of sprawling or irregular cities.
+    # Tiles partition the plane and H3 assigns cells by centroid, so the
+    # union of the tile fills equals the fill of the whole boundary.
+    minx, miny, maxx, maxy = boundary.bounds
+    if max(maxx - minx, maxy - miny) > POLYFILL_TILE_DEG:
+        polygons = _tile_polygons(boundary, POLYFILL_TILE_DEG)
+        logger.debug("Polyfill split into %d tiles.", len(polygons))
     else:
-        polygons = [boundary]
+        polygons = list(shapely.get_parts(boundary))
 
-    for poly in polygons:
-        geojson = mapping(poly)
-        filled = h3.polyfill_geojson(geojson, h3_res)
-        cells.update(filled)
+    # The numpy_int API hands back each fill as a uint64 array straight from
+    # the C layer, so sub-polygon results are merged with one np.unique
+    # instead of hashing hex strings into a Python set.  Cells stay uint64
+    # through the whole pipeline and are only rendered as hex strings when
+    # outputs are written (see ``cells_to_strings``).
+    filled = [h3_int.polyfill_geojson(mapping(poly), h3_res) for poly in polygons]
+    cells = np.unique(np.concatenate(filled)) if filled else np.empty(0, np.uint64)
 
     logger.debug("Polyfilled %d H3 cells at resolution %d.", len(cells), h3_res)
-    return list(cells)
+    pd.DataFrame({"h3_index": cells}).to_parquet(cache_file, index=False, compression="zstd")
+    return cells
 
 
 # ---------------------------------------------------------------------------
@@ -135,25 +187,25 @@ def polyfill_boundary(
 # ---------------------------------------------------------------------------
 
 def build_hex_geodataframe(
-    h3_indices: List[str],
+    h3_indices: np.ndarray,
     h3_res: int,
     city: CityConfig,
     projected_crs: CRS | str,
+    exact_area: bool = False,
 ) -> gpd.GeoDataFrame:
     """
     Build a GeoDataFrame with one row per H3 hex cell.
 
     Each row contains:
-    - ``h3_index``: H3 cell identifier
+    - ``h3_index``: H3 cell identifier (``uint64``)
     - ``hex_centroid_lat``, ``hex_centroid_lon``: WGS-84 centroid
     - ``geometry``: projected polygon (metres CRS) for metric computations
-    - ``geometry_wgs84``: WGS-84 polygon (for GeoJSON output)
-    - ``hex_area_km2``: area in km²
+    - ``hex_area_km2``: area in km² (H3's mean hexagon area by default)
 
     Parameters
     ----------
     h3_indices:
-        List of H3 cell index strings.
+        ``np.uint64`` array of H3 cell indices (as from ``polyfill_boundary``).
     h3_res:
         H3 resolution (stored as metadata column).
     city:
@@ -161,44 +213,59 @@ def build_hex_geodataframe(
     projected_crs:
         Metres-based CRS to project hex polygons into (should match the road
         graph CRS so that spatial joins are consistent).
+    exact_area:
+        If True, measure ``hex_area_km2`` as the planar area of each
+        projected polygon (the previous behaviour) instead of broadcasting
+        H3's mean hexagon area for *h3_res*. Mainly useful for debugging.
 
     Returns
     -------
-    GeoDataFrame with geometry in *projected_crs*.
+    GeoDataFrame with geometry in *projected_crs*.  No WGS-84 geometry is
+    kept; writers that need it rebuild it from ``h3_index`` with
+    ``cells_to_polygons``.
     """
     logger.info(
         "[%s] Building hex GeoDataFrame for %d cells…", city.slug, len(h3_indices)
     )
 
-    records = []
-    for idx in h3_indices:
-        # h3.h3_to_geo returns (lat, lng)
-        lat, lon = h3.h3_to_geo(idx)
-        # h3.h3_to_geo_boundary returns list of (lat, lng) tuples
-        boundary_coords = h3.h3_to_geo_boundary(idx)  # [(lat, lng), ...]
-        # Shapely Polygon expects (x=lon, y=lat)
-        poly_wgs84 = Polygon([(lng, lat_) for lat_, lng in boundary_coords])
-        records.append(
-            {
-                "h3_index": idx,
-                "h3_res": h3_res,
-                "city": city.name,
-                "hex_centroid_lat": lat,
-                "hex_centroid_lon": lon,
-                "geometry": poly_wgs84,
-            }
-        )
-
-    gdf_wgs84 = gpd.GeoDataFrame(records, geometry="geometry", crs="EPSG:4326")
-
-    # Store WGS-84 geometry before reprojecting
-    gdf_wgs84["geometry_wgs84"] = gdf_wgs84["geometry"]
-
-    # Reproject to metres CRS
-    gdf_proj = gdf_wgs84.to_crs(projected_crs)
+    cells = np.asarray(h3_indices, dtype=np.uint64)
+    n = len(cells)
+    # h3_to_geo returns (lat, lng); plain ints are the cheapest h3 input.
+    # Centroids are streamed straight into a preallocated (n, 2) array.
+    centroids = np.fromiter(
+        (h3_int.h3_to_geo(c) for c in cells.tolist()),
+        dtype=(np.float64, 2),
+        count=n,
+    )
+    # Boundary vertices go WGS-84 → projected in one bulk transform, so the
+    # polygons are only ever built once, directly in the metres CRS.
+    polygons = cells_to_polygons(cells, to_crs=projected_crs)
+
+    # Column-wise (SoA) construction: one array per column, no per-row
+    # records.  ``city`` is a single repeated label, so store it as a
+    # one-category Categorical (int8 codes) rather than n string references.
+    gdf_proj = gpd.GeoDataFrame(
+        {
+            "h3_index": cells,
+            "h3_res": h3_res,
+            "city": pd.Categorical.from_codes(
+                np.zeros(n, dtype=np.int8), categories=[city.name]
+            ),
+            "hex_centroid_lat": centroids[:, 0],
+            "hex_centroid_lon": centroids[:, 1],
+            "geometry": polygons,
+        },
+        geometry="geometry",
+        crs=projected_crs,
+    )
 
-    # Compute area in km²
-    gdf_proj["hex_area_km2"] = gdf_proj["geometry"].area / 1_000_000
+    # Compute area in km².  All cells share one resolution, so H3's mean
+    # hexagon area for it is broadcast (a table lookup, no per-cell pass);
+    # the planar area of each projected polygon is kept for debugging.
+    if exact_area:
+        gdf_proj["hex_area_km2"] = shapely.area(polygons) / 1_000_000
+    else:
+        gdf_proj["hex_area_km2"] = h3_int.hex_area(h3_res, unit="km^2")
 
     logger.info(
         "[%s] Hex areas: min=%.4f km², mean=%.4f km², max=%.4f km²",
@@ -211,13 +278,166 @@ def build_hex_geodataframe(
     return gdf_proj
 
 
+# ---------------------------------------------------------------------------
+# Spatial index
+# ---------------------------------------------------------------------------
+
+def build_hex_index(hexes: gpd.GeoDataFrame) -> shapely.STRtree:
+    """
+    Return an STR-packed R-tree over the projected hex polygons.
+
+    Build it once per city and pass it to the per-hex metric functions: each
+    ``tree.query(geoms, predicate=...)`` call does an envelope (MBR) filter
+    in the tree followed by an exact GEOS predicate on the surviving pairs,
+    and returns positional ``(input_idx, hex_idx)`` arrays.
+    """
+    return shapely.STRtree(hexes.geometry.values)
+
+
 # ---------------------------------------------------------------------------
 # Utilities
 # ---------------------------------------------------------------------------
 
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype="S1")
+_CELL_NIBBLE_SHIFTS = np.arange(56, -1, -4, dtype=np.uint64)   # 15 hex digits
+
+
+def cells_to_strings(cells: np.ndarray) -> np.ndarray:
+    """
+    Render uint64 H3 cell indices as the canonical hex strings (object array).
+
+    A valid H3 *cell* index has mode 1 in bits 59–62 and the reserved top bit
+    clear, i.e. ``index >> 59 == 1``, so its string form is always exactly 15
+    lower-case hex digits.  The digits are cut out with array shifts instead
+    of one ``h3_to_string`` call per cell; anything else falls back to h3.
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    if not np.all((cells >> np.uint64(59)) == 1):
+        return np.array([h3.h3_to_string(c) for c in cells.tolist()], dtype=object)
+    nibbles = (cells[:, None] >> _CELL_NIBBLE_SHIFTS) & np.uint64(0xF)
+    digits = np.ascontiguousarray(_HEX_DIGITS[nibbles])
+    return digits.view("S15").ravel().astype(str).astype(object)
+
+
+def points_to_cells(lats: np.ndarray, lons: np.ndarray, h3_res: int) -> np.ndarray:
+    """Return the uint64 H3 cell containing each WGS-84 (lat, lon) point."""
+    return np.fromiter(
+        (h3_int.geo_to_h3(lat, lon, h3_res) for lat, lon in zip(lats.tolist(), lons.tolist())),
+        dtype=np.uint64,
+        count=len(lats),
+    )
+
+
+def cells_to_polygons(cells: np.ndarray, to_crs: CRS | str | None = None) -> np.ndarray:
+    """
+    Return an array of hex polygons, one per H3 cell.
+
+    Boundary vertices for all cells are gathered into a single coordinate
+    array and the polygons are built in one vectorized Shapely call, rather
+    than constructing a ``Polygon`` per cell.
+
+    Parameters
+    ----------
+    cells:
+        ``np.uint64`` array of H3 cell indices.
+    to_crs:
+        Optional target CRS. When given, the vertex array is reprojected from
+        WGS-84 in a single pyproj call before the polygons are built;
+        otherwise polygons are in EPSG:4326.
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    # geo_json=True yields closed rings of (lng, lat) — Shapely's (x, y) order
+    rings = [h3_int.h3_to_geo_boundary(c, geo_json=True) for c in cells.tolist()]
+    if not rings:
+        return np.empty(0, dtype=object)
+    # Pentagons / distorted cells have more vertices, so rings are ragged
+    counts = np.fromiter((len(r) for r in rings), dtype=np.intp, count=len(rings))
+    coords = np.array([xy for ring in rings for xy in ring], dtype=np.float64)
+    if to_crs is not None:
+        xs, ys = _transformer("EPSG:4326", to_crs).transform(coords[:, 0], coords[:, 1])
+        coords = np.column_stack([xs, ys])
+    ring_ids = np.repeat(np.arange(len(rings)), counts)
+    return shapely.polygons(shapely.linearrings(coords, indices=ring_ids))
+
+
+def _tile_polygons(geom: Polygon | MultiPolygon, tile_deg: float) -> List[Polygon]:
+    """Cut *geom* along a regular lon/lat grid and return the polygon pieces."""
+    minx, miny, maxx, maxy = geom.bounds
+    xs = np.arange(minx, maxx, tile_deg)
+    ys = np.arange(miny, maxy, tile_deg)
+    x0, y0 = np.meshgrid(xs, ys)
+    tiles = shapely.box(x0, y0, x0 + tile_deg, y0 + tile_deg).ravel()
+    pieces = shapely.get_parts(shapely.intersection(geom, tiles))
+    # Clipping along a shared edge can also yield stray lines / points, and
+    # tiles that miss the boundary (concave or multi-part cities) come back
+    # as POLYGON EMPTY, which h3's polyfill cannot take.
+    keep = (shapely.get_type_id(pieces) == 3) & ~shapely.is_empty(pieces)
+    return list(pieces[keep])
+
+
+def _reproject(geom, transformer: Transformer):
+    """
+    Reproject a Shapely geometry with a single bulk pyproj call.
+
+    ``shapely.transform`` hands the whole (N, 2) coordinate array to the
+    callback at once, unlike ``shapely.ops.transform`` which calls back into
+    Python for every vertex.
+    """
+    return shapely.transform(
+        geom,
+        lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])),
+    )
+
+
+@lru_cache(maxsize=64)
+def _transformer(crs_from: CRS | str, crs_to: CRS | str) -> Transformer:
+    """Return a cached lon/lat-ordered (``always_xy``) pyproj Transformer."""
+    return Transformer.from_crs(crs_from, crs_to, always_xy=True)
+
+
+def _utm_transformers(utm_crs: str) -> Tuple[Transformer, Transformer]:
+    """Return cached (WGS-84 → *utm_crs*, *utm_crs* → WGS-84) transformers."""
+    return _transformer("EPSG:4326", utm_crs), _transformer(utm_crs, "EPSG:4326")
+
+
+@lru_cache(maxsize=None)
 def _estimate_utm_crs(lat: float, lon: float) -> str:
-    """Return an EPSG code string for the UTM zone containing (lat, lon)."""
-    zone = int((lon + 180) / 6) + 1
+    """
+    Return an EPSG code string for the WGS-84 UTM zone containing (lat, lon).
+
+    Asks the PROJ database (``query_utm_crs_info``), which knows each zone's
+    published area of use; falls back to the plain 6° zone arithmetic if the
+    database has no answer (e.g. a very old PROJ data package).
+
+    A point on a zone boundary (or the equator) matches several zones, and
+    PROJ's result order is not meaningful, so the candidate in *lat*'s
+    hemisphere whose central meridian is nearest *lon* is chosen; ties go
+    to the eastern zone, as in the arithmetic. Neither path applies the
+    Norway/Svalbard zone exceptions.
+    """
+    infos = query_utm_crs_info(
+        datum_name="WGS 84",
+        area_of_interest=AreaOfInterest(
+            west_lon_degree=lon,
+            south_lat_degree=lat,
+            east_lon_degree=lon,
+            north_lat_degree=lat,
+        ),
+    )
+    # (is northern, zone number) of each WGS-84 UTM match (EPSG 326zz/327zz)
+    candidates = []
+    for info in infos:
+        code = int(info.code) if info.code.isdigit() else 0
+        if info.auth_name == "EPSG" and code // 100 in (326, 327):
+            candidates.append((code // 100 == 326, code % 100))
+    if candidates:
+        north, zone = min(
+            candidates,
+            key=lambda nz: (nz[0] != (lat >= 0), abs(-183 + 6 * nz[1] - lon), -nz[1]),
+        )
+        return f"EPSG:{(32600 if north else 32700) + zone}"
+
+    zone = min(int((lon + 180) / 6) + 1, 60)
     if lat >= 0:
         return f"EPSG:{32600 + zone}"
     else:
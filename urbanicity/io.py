@@ -7,12 +7,17 @@ from __future__ import annotations
 import json
 import logging
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyogrio import write_dataframe
 
-from urbanicity.config import OUTPUT_DIR, OUTPUT_COLUMNS, CityConfig
+from urbanicity.config import GEOMETRY_FORMATS, OUTPUT_DIR, OUTPUT_COLUMNS, CityConfig
+from urbanicity.h3grid import cells_to_polygons, cells_to_strings
 
 logger = logging.getLogger(__name__)
 
@@ -21,11 +26,15 @@ _SCORE_COL = "urbanicity_score_continuous"
 
 
 class _SafeEncoder(json.JSONEncoder):
-    """Convert numpy scalars and Python bools to plain JSON-serialisable types."""
+    """
+    Convert numpy scalars (int64, float32, bool_, …) to plain Python types.
+
+    ``default`` is only consulted for objects the C encoder cannot handle, so
+    native ints/floats/bools never reach it; the payloads here are a few
+    dozen values, so the stdlib encoder is not a bottleneck.
+    """
     def default(self, obj):
-        if isinstance(obj, bool):
-            return bool(obj)
-        if hasattr(obj, "item"):   # numpy scalar (int64, float64, bool_, …)
+        if isinstance(obj, np.generic):
             return obj.item()
         return super().default(obj)
 
@@ -40,13 +49,82 @@ def _city_output_dir(city: CityConfig) -> Path:
     return d
 
 
-def _select_output_columns(gdf: gpd.GeoDataFrame) -> pd.DataFrame:
-    """Return a plain DataFrame with the canonical output columns (in order)."""
-    available = [c for c in OUTPUT_COLUMNS if c in gdf.columns]
+def _h3_index_as_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Render a uint64 ``h3_index`` column as H3 hex strings (in place)."""
+    if "h3_index" in df.columns and pd.api.types.is_integer_dtype(df["h3_index"]):
+        df["h3_index"] = cells_to_strings(df["h3_index"].to_numpy())
+    return df
+
+
+def _available_columns(columns: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Canonical output columns present in *columns*, in schema order.
+
+    Logs a warning naming any canonical columns that are missing.
+    """
+    available = tuple(c for c in OUTPUT_COLUMNS if c in columns)
     missing = set(OUTPUT_COLUMNS) - set(available)
     if missing:
         logger.warning("Output is missing columns: %s", sorted(missing))
-    return gdf[available].copy()
+    return available
+
+
+def _select_output_columns(gdf: gpd.GeoDataFrame) -> pd.DataFrame:
+    """Return a plain DataFrame with the canonical output columns (in order)."""
+    available = _available_columns(tuple(gdf.columns))
+    # Zero-copy projection (``gdf[available]`` would take a copy of every
+    # column): writers only replace whole columns (h3_index strings,
+    # de-categorised labels), never write into the shared numpy buffers.
+    df = pd.DataFrame({c: gdf[c] for c in available}, copy=False)
+    # h3_index is carried as uint64 in memory; outputs keep the string form
+    return _h3_index_as_strings(df)
+
+
+def _scalar_attrs(attrs: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the JSON-safe scalar entries of *attrs* (numpy scalars unboxed)."""
+    out: Dict[str, Any] = {}
+    for key, value in attrs.items():
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, (bool, int, float, str)):
+            out[key] = value
+    return out
+
+
+def _threshold(gdf: gpd.GeoDataFrame, name: str) -> Optional[float]:
+    """
+    Band threshold *name* from ``gdf.attrs`` (exact float64, set by scoring),
+    falling back to the first value of the replicated column.
+    """
+    if name in gdf.attrs:
+        return float(gdf.attrs[name])
+    if name in gdf.columns and len(gdf):
+        return float(gdf[name].iloc[0])
+    return None
+
+
+def _extreme_positions(scores: np.ndarray, k: int, largest: bool) -> np.ndarray:
+    """
+    Positions of the *k* largest (or smallest) non-NaN scores, best first.
+
+    ``np.argpartition`` selects the k candidates in O(n); only those k are
+    sorted, instead of the full-column sort behind ``nlargest``/``nsmallest``.
+    """
+    valid = np.flatnonzero(~np.isnan(scores))
+    vals = -scores[valid] if largest else scores[valid]
+    k = min(k, len(vals))
+    if k <= 0:
+        return valid[:0]
+    part = np.argpartition(vals, k - 1)[:k] if k < len(vals) else np.arange(k)
+    return valid[part[np.argsort(vals[part], kind="stable")]]
+
+
+def _hex_records(df: pd.DataFrame) -> list:
+    """Round the score, stringify ``h3_index`` and return JSON-ready records."""
+    df = df.copy()
+    # Widen before rounding: a rounded float32 still prints as 1.2345000505…
+    df[_SCORE_COL] = df[_SCORE_COL].astype(np.float64).round(4)
+    return _h3_index_as_strings(df).to_dict(orient="records")
 
 
 # ---------------------------------------------------------------------------
@@ -62,43 +140,102 @@ def write_parquet(
     out_dir = _city_output_dir(city)
     path = out_dir / filename
     df = _select_output_columns(gdf)
-    # pandas serialises df.attrs as JSON Parquet metadata; clear it to avoid
-    # TypeError with bool/float values on Python 3.9's json encoder.
-    df.attrs = {}
-    df.to_parquet(path, index=False, engine="pyarrow")
+    # One city fits in a single row group; zstd is ~20-30% smaller than the
+    # snappy default at similar write speed for these numeric columns.
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # City-level scalars (weights, thresholds, signals_used) ride along as
+    # the JSON metadata pandas restores into ``attrs`` on read_parquet.
+    attrs = _scalar_attrs(gdf.attrs)
+    if attrs:
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), b"PANDAS_ATTRS": json.dumps(attrs).encode()}
+        )
+    pq.write_table(
+        table,
+        path,
+        compression="zstd",
+        compression_level=3,
+        row_group_size=max(len(df), 1),
+    )
     logger.info("[%s] Parquet written: %s (%d rows)", city.slug, path, len(df))
     return path
 
 
 # ---------------------------------------------------------------------------
-# GeoJSON
+# Hex geometry layer (GeoParquet / FlatGeobuf / GeoJSON)
 # ---------------------------------------------------------------------------
 
-def write_geojson(
+# format → (default filename, OGR driver; None = written via pyarrow)
+_GEOMETRY_FORMATS: Dict[str, Tuple[str, Optional[str]]] = {
+    "parquet": ("h3_urbanicity_res8_geo.parquet", None),
+    "fgb":     ("h3_urbanicity_res8.fgb",         "FlatGeobuf"),
+    "geojson": ("h3_urbanicity_res8.geojson",     "GeoJSON"),
+}
+
+
+def write_geometry(
     gdf: gpd.GeoDataFrame,
     city: CityConfig,
-    filename: str = "h3_urbanicity_res8.geojson",
+    fmt: str = "parquet",
+    filename: Optional[str] = None,
 ) -> Path:
     """
-    Write hex metrics to GeoJSON using WGS-84 hex polygons.
-
-    The ``geometry_wgs84`` column (stored during H3 grid construction) is
-    used so the file is in standard lat/lon coordinates.
+    Write hex metrics with WGS-84 hex polygons.
+
+    The in-memory frame only carries projected geometry, so WGS-84 polygons
+    are rebuilt from the uint64 ``h3_index`` column (exact H3 boundaries in
+    standard lat/lon coordinates).
+
+    Parameters
+    ----------
+    fmt:
+        ``"parquet"`` (GeoParquet, WKB geometry, zstd — the default and by
+        far the smallest/fastest), ``"fgb"`` (FlatGeobuf, for streaming
+        clients) or ``"geojson"`` (for tools that only read GeoJSON).
+    filename:
+        Override the per-format default file name.
     """
+    if fmt not in _GEOMETRY_FORMATS:
+        raise ValueError(f"Unknown geometry format {fmt!r}; expected one of {GEOMETRY_FORMATS}")
+    default_name, driver = _GEOMETRY_FORMATS[fmt]
+
     out_dir = _city_output_dir(city)
-    path = out_dir / filename
+    path = out_dir / (filename or default_name)
 
-    if "geometry_wgs84" not in gdf.columns:
-        logger.warning("[%s] 'geometry_wgs84' not found; skipping GeoJSON.", city.slug)
+    if "h3_index" not in gdf.columns:
+        logger.warning("[%s] 'h3_index' not found; skipping %s output.", city.slug, fmt)
         return path
 
+    geometry = cells_to_polygons(gdf["h3_index"].to_numpy())
     df = _select_output_columns(gdf)
-    geo_gdf = gpd.GeoDataFrame(df, geometry=gdf["geometry_wgs84"].values, crs="EPSG:4326")
-    geo_gdf.to_file(path, driver="GeoJSON")
-    logger.info("[%s] GeoJSON written: %s (%d features)", city.slug, path, len(geo_gdf))
+    df.attrs = {}
+    if driver is not None:
+        # OGR has no categorical field type; write the plain label values
+        for col in df.select_dtypes("category").columns:
+            df[col] = np.asarray(df[col])
+    # Wraps df's columns in place (copy=False); the geometry array is the
+    # only new allocation.
+    geo_gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326", copy=False)
+
+    if driver is None:
+        geo_gdf.to_parquet(path, index=False, compression="zstd")
+    else:
+        # pyogrio writes straight from the geometry array (WKB) in C instead
+        # of fiona's per-feature iterfeatures/mapping loop.
+        write_dataframe(geo_gdf, path, driver=driver)
+    logger.info("[%s] %s written: %s (%d features)", city.slug, fmt, path, len(geo_gdf))
     return path
 
 
+def write_geojson(
+    gdf: gpd.GeoDataFrame,
+    city: CityConfig,
+    filename: str = "h3_urbanicity_res8.geojson",
+) -> Path:
+    """Write hex metrics to GeoJSON (see ``write_geometry``)."""
+    return write_geometry(gdf, city, fmt="geojson", filename=filename)
+
+
 # ---------------------------------------------------------------------------
 # Thresholds sidecar
 # ---------------------------------------------------------------------------
@@ -127,8 +264,8 @@ def write_thresholds(
     out_dir = _city_output_dir(city)
     path = out_dir / filename
 
-    t_low  = float(gdf["t_low_q30"].iloc[0])  if "t_low_q30"  in gdf.columns else None
-    t_high = float(gdf["t_high_q70"].iloc[0]) if "t_high_q70" in gdf.columns else None
+    t_low  = _threshold(gdf, "t_low_q30")
+    t_high = _threshold(gdf, "t_high_q70")
 
     signals_used = gdf.attrs.get("signals_used", None)
     w_int  = gdf.attrs.get("w_int_eff",  None)
@@ -188,20 +325,10 @@ def write_summary(
             s = gdf[col].describe()
             desc[col] = {k: round(float(v), 6) for k, v in s.items()}
 
-    top10 = (
-        gdf.nlargest(10, _SCORE_COL)[[
-            "h3_index", _SCORE_COL, "urbanicity_band_3_2_1"
-        ]]
-        .assign(**{_SCORE_COL: lambda d: d[_SCORE_COL].round(4)})
-        .to_dict(orient="records")
-    )
-    bottom10 = (
-        gdf.nsmallest(10, _SCORE_COL)[[
-            "h3_index", _SCORE_COL, "urbanicity_band_3_2_1"
-        ]]
-        .assign(**{_SCORE_COL: lambda d: d[_SCORE_COL].round(4)})
-        .to_dict(orient="records")
-    )
+    scores = gdf[_SCORE_COL].to_numpy()
+    extreme_cols = ["h3_index", _SCORE_COL, "urbanicity_band_3_2_1"]
+    top10 = _hex_records(gdf.iloc[_extreme_positions(scores, 10, largest=True)][extreme_cols])
+    bottom10 = _hex_records(gdf.iloc[_extreme_positions(scores, 10, largest=False)][extreme_cols])
 
     summary: Dict[str, Any] = {
         "city": city.name,
@@ -2,34 +2,97 @@
 Per-hex metric computation.
 
 All spatial operations are performed in a metres-based projected CRS so that
-areas (km²) and lengths (km) are correct.
+areas (km²) and lengths (km) are correct.  Inputs must arrive already in the
+hexes' CRS (signals: EPSG:4326); the functions raise ValueError rather than
+reprojecting per metric.
 
 Performance notes
 -----------------
-* Intersection density uses a spatial join (sjoin) — O(n log n).
-* Road density uses GeoPandas overlay + apportioned clipping — O(edges × hexes)
-  in the worst case but bounded in practice by spatial indexing.
-* Signal density uses sjoin — O(n log n).
+* Intersection counts query a shared STRtree over the hex polygons —
+  envelope filter then exact ``within`` test — and aggregate with
+  ``np.bincount``.  O(n log n), with the tree built once per city.
+* Signal counts skip geometry entirely: points are H3-indexed and joined to
+  the hexes on the uint64 cell ID.  O(n).
+* Road density pairs edges with hexes through the same STRtree; edges fully
+  inside one hex are summed unclipped, the rest are clipped in one
+  vectorised ``shapely.intersection`` and the lengths summed with
+  ``np.bincount`` — no per-batch overlay or groupby.
+* ``compute_all_metrics`` runs the three metrics on threads: they read
+  independent inputs and the heavy shapely 2 calls release the GIL.
 """
 
 from __future__ import annotations
 
 import logging
 import warnings
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+import shapely
 from shapely.errors import ShapelyDeprecationWarning
 
 from urbanicity.config import CityConfig
+from urbanicity.h3grid import points_to_cells
 
 logger = logging.getLogger(__name__)
 
 warnings.filterwarnings("ignore", category=ShapelyDeprecationWarning)
 
 
+# ---------------------------------------------------------------------------
+# Shared helpers
+# ---------------------------------------------------------------------------
+
+def _require_crs(gdf: gpd.GeoDataFrame, crs, name: str) -> None:
+    """
+    Raise ValueError unless *gdf* is already in *crs*.
+
+    Inputs are projected once, upstream (the graph is downloaded projected
+    and hexes are built in its CRS); a mismatch here is a caller bug, not
+    something to paper over with a per-metric ``to_crs``.
+    """
+    if gdf.crs is None or not gdf.crs.equals(crs):
+        raise ValueError(f"{name} CRS {gdf.crs} does not match the expected {crs}")
+
+
+def _density_series(values, hexes: gpd.GeoDataFrame, name: str) -> pd.Series:
+    """
+    Wrap per-hex *values* (array or scalar) as a float32 Series on
+    ``hexes.index``.  Densities are stored as float32 (see
+    ``config.OUTPUT_DTYPES``), so they are produced at that width directly.
+    """
+    if np.isscalar(values):
+        values = np.full(len(hexes), values, dtype=np.float32)
+    return pd.Series(np.asarray(values, dtype=np.float32), index=hexes.index, name=name)
+
+
+def _inv_area(hexes: gpd.GeoDataFrame, inv_area_km2: np.ndarray | None) -> np.ndarray:
+    """Return *inv_area_km2*, or ``1 / hexes["hex_area_km2"]`` if not given."""
+    if inv_area_km2 is None:
+        inv_area_km2 = 1.0 / hexes["hex_area_km2"].to_numpy(dtype=np.float64)
+    return inv_area_km2
+
+
+def _count_points_per_hex(
+    hexes: gpd.GeoDataFrame,
+    points: gpd.GeoDataFrame,
+    hex_tree: shapely.STRtree | None,
+) -> np.ndarray:
+    """
+    Return the number of *points* inside each hex (positional, len(hexes)).
+
+    Uses the STRtree over hex polygons (built here if not supplied) to pair
+    each point with the hex it falls ``within``; a point on a shared edge is
+    within neither hex, matching the previous sjoin semantics.
+    """
+    if hex_tree is None:
+        hex_tree = shapely.STRtree(hexes.geometry.values)
+    _, hex_idx = hex_tree.query(points.geometry.values, predicate="within")
+    return np.bincount(hex_idx, minlength=len(hexes))
+
+
 # ---------------------------------------------------------------------------
 # 1. Intersection density
 # ---------------------------------------------------------------------------
@@ -38,6 +101,8 @@ def compute_intersection_density(
     hexes: gpd.GeoDataFrame,
     intersections: gpd.GeoDataFrame,
     city: CityConfig,
+    hex_tree: shapely.STRtree | None = None,
+    inv_area_km2: np.ndarray | None = None,
 ) -> pd.Series:
     """
     Count intersection nodes per hex and divide by hex area (km²).
@@ -50,6 +115,13 @@ def compute_intersection_density(
         GeoDataFrame of intersection node points in the **same** metres CRS.
     city:
         For logging only.
+    hex_tree:
+        Optional STRtree over ``hexes.geometry`` (see
+        ``h3grid.build_hex_index``); built on the fly when omitted.
+    inv_area_km2:
+        Optional precomputed ``1 / hex_area_km2`` (positional); computed here
+        when omitted.  ``compute_all_metrics`` shares one array across all
+        three metrics.
 
     Returns
     -------
@@ -59,25 +131,15 @@ def compute_intersection_density(
 
     if intersections.empty:
         logger.warning("[%s] No intersection nodes found.", city.slug)
-        return pd.Series(0.0, index=hexes.index, name="intersection_density_per_km2")
-
-    # Ensure matching CRS
-    if hexes.crs != intersections.crs:
-        intersections = intersections.to_crs(hexes.crs)
-
-    # Spatial join: for each intersection point find which hex it falls into
-    joined = gpd.sjoin(
-        intersections[["geometry"]],
-        hexes[["geometry", "hex_area_km2"]],
-        how="inner",
-        predicate="within",
-    )
+        return _density_series(0.0, hexes, "intersection_density_per_km2")
+
+    _require_crs(intersections, hexes.crs, "intersections")
 
-    counts = joined.groupby("index_right").size().rename("intersection_count")
-    hexes_merged = hexes[["hex_area_km2"]].join(counts, how="left")
-    hexes_merged["intersection_count"] = hexes_merged["intersection_count"].fillna(0)
-    density = hexes_merged["intersection_count"] / hexes_merged["hex_area_km2"]
-    density.name = "intersection_density_per_km2"
+    # For each intersection point find which hex it falls into
+    counts = _count_points_per_hex(hexes, intersections, hex_tree)
+    density = _density_series(
+        counts * _inv_area(hexes, inv_area_km2), hexes, "intersection_density_per_km2"
+    )
 
     logger.info(
         "[%s] Intersection density: min=%.2f, mean=%.2f, max=%.2f (per km²)",
@@ -97,7 +159,8 @@ def compute_road_density(
     hexes: gpd.GeoDataFrame,
     edges: gpd.GeoDataFrame,
     city: CityConfig,
-    chunk_size: int = 5_000,
+    hex_tree: shapely.STRtree | None = None,
+    inv_area_km2: np.ndarray | None = None,
 ) -> pd.Series:
     """
     Compute road length per hex (km) divided by hex area (km²).
@@ -108,23 +171,30 @@ def compute_road_density(
 
     Strategy
     --------
-    1. Clip edges to each hex via overlay (``gpd.overlay``).
-    2. Recompute the clipped segment length in metres.
-    3. Aggregate per hex.
-
-    To keep memory usage manageable the edge set is processed in spatial
-    chunks (by hex batch).
+    1. Find edges lying entirely ``within`` one hex via the hex STRtree; they
+       contribute their full planar length with no clipping (the common case
+       for short urban edges).
+    2. Pair the remaining (boundary-crossing) edges with every hex they
+       intersect, clip each pair with one vectorised ``shapely.intersection``
+       and measure the pieces with ``shapely.length`` (metres).
+    3. Sum per hex with ``np.bincount``.
 
     Parameters
     ----------
     hexes:
         GeoDataFrame of hex polygons in metres CRS.
     edges:
-        GeoDataFrame of road edges with ``length_m`` column, in metres CRS.
+        GeoDataFrame of road edges with ``length_m`` column, in the **same**
+        metres CRS as ``hexes``.
     city:
         For logging only.
-    chunk_size:
-        Number of hexes processed per overlay batch.
+    hex_tree:
+        Optional STRtree over ``hexes.geometry`` (see
+        ``h3grid.build_hex_index``); built on the fly when omitted.
+    inv_area_km2:
+        Optional precomputed ``1 / hex_area_km2`` (positional); computed here
+        when omitted.  ``compute_all_metrics`` shares one array across all
+        three metrics.
 
     Returns
     -------
@@ -134,91 +204,35 @@ def compute_road_density(
 
     if edges.empty:
         logger.warning("[%s] No edges found.", city.slug)
-        return pd.Series(0.0, index=hexes.index, name="road_density_km_per_km2")
+        return _density_series(0.0, hexes, "road_density_km_per_km2")
 
-    # Ensure matching CRS
-    if hexes.crs != edges.crs:
-        edges = edges.to_crs(hexes.crs)
+    _require_crs(edges, hexes.crs, "edges")
 
-    hexes_reset = hexes[["geometry", "hex_area_km2"]].reset_index(drop=False)
-    hex_idx_col = hexes_reset.columns[0]  # original index column name
+    if hex_tree is None:
+        hex_tree = shapely.STRtree(hexes.geometry.values)
+    hex_geoms = hexes.geometry.values
+    edge_geoms = edges.geometry.values
 
-    # Build spatial index on edges once
-    edges_sindex = edges.sindex
-
-    road_length_km: dict[int, float] = {}  # hex positional index → km
-
-    n_hexes = len(hexes_reset)
-    n_batches = max(1, (n_hexes + chunk_size - 1) // chunk_size)
-
-    for batch_i in range(n_batches):
-        start = batch_i * chunk_size
-        end = min(start + chunk_size, n_hexes)
-        hex_batch = hexes_reset.iloc[start:end]
-
-        # Find candidate edges that intersect this batch's bounding box
-        batch_union_bounds = hex_batch.geometry.total_bounds  # (minx, miny, maxx, maxy)
-        candidate_idx = list(
-            edges_sindex.intersection(batch_union_bounds)
-        )
-        if not candidate_idx:
-            continue
-        candidate_edges = edges.iloc[candidate_idx]
-
-        # Overlay: intersect candidate edges with hex batch polygons
-        try:
-            clipped = gpd.overlay(
-                candidate_edges[["geometry"]].reset_index(drop=True),
-                hex_batch[[hex_idx_col, "geometry"]].reset_index(drop=True),
-                how="intersection",
-                keep_geom_type=False,
-            )
-        except Exception as exc:
-            logger.debug(
-                "[%s] Overlay error in batch %d/%d: %s — skipping.",
-                city.slug, batch_i + 1, n_batches, exc,
-            )
-            continue
-
-        if clipped.empty:
-            continue
-
-        # Drop non-linear geometry types (points from touching boundaries)
-        clipped = clipped[
-            clipped.geometry.geom_type.isin(["LineString", "MultiLineString"])
-        ]
-        if clipped.empty:
-            continue
-
-        # Recompute clipped segment length in metres (in projected CRS)
-        clipped["clipped_length_m"] = clipped.geometry.length
-
-        # Aggregate per hex (identified by the hex_idx_col which holds the
-        # positional index into hexes_reset)
-        agg = clipped.groupby(hex_idx_col)["clipped_length_m"].sum()
-
-        for pos_idx, length_m in agg.items():
-            road_length_km[int(pos_idx)] = road_length_km.get(int(pos_idx), 0.0) + length_m / 1_000
-
-        if (batch_i + 1) % 10 == 0 or (batch_i + 1) == n_batches:
-            logger.info(
-                "[%s] Road density: processed batch %d/%d…",
-                city.slug,
-                batch_i + 1,
-                n_batches,
-            )
-
-    # Map positional indices back to original hex index
-    road_km_series = pd.Series(road_length_km, name="road_length_km")
-    hexes_reset["road_length_km"] = hexes_reset.index.map(road_km_series).fillna(0.0)
-    hexes_reset["road_density_km_per_km2"] = (
-        hexes_reset["road_length_km"] / hexes_reset["hex_area_km2"]
+    # Pass 1: an edge within a hex lies in no other hex (interiors are
+    # disjoint), so its whole length belongs to that hex.
+    inside_edge, inside_hex = hex_tree.query(edge_geoms, predicate="within")
+    length_m = np.bincount(
+        inside_hex, weights=shapely.length(edge_geoms[inside_edge]), minlength=len(hexes)
     )
 
-    # Restore original index alignment
-    result = hexes_reset["road_density_km_per_km2"]
-    result.index = hexes.index
-    result.name = "road_density_km_per_km2"
+    # Pass 2: clip only the boundary-crossing edges.  Edges that merely
+    # touch a hex clip to points / empty geometries of length 0, so they
+    # drop out of the sum without explicit filtering.
+    crossing = np.ones(len(edge_geoms), dtype=bool)
+    crossing[inside_edge] = False
+    crossing_idx = np.flatnonzero(crossing)
+    edge_idx, hex_idx = hex_tree.query(edge_geoms[crossing_idx], predicate="intersects")
+    clipped = shapely.intersection(hex_geoms[hex_idx], edge_geoms[crossing_idx[edge_idx]])
+    length_m += np.bincount(hex_idx, weights=shapely.length(clipped), minlength=len(hexes))
+
+    result = _density_series(
+        length_m / 1_000 * _inv_area(hexes, inv_area_km2), hexes, "road_density_km_per_km2"
+    )
 
     logger.info(
         "[%s] Road density: min=%.2f, mean=%.2f, max=%.2f (km/km²)",
@@ -238,18 +252,28 @@ def compute_signal_density(
     hexes: gpd.GeoDataFrame,
     signals: gpd.GeoDataFrame,
     city: CityConfig,
+    inv_area_km2: np.ndarray | None = None,
 ) -> pd.Series:
     """
     Count signal/stop features per hex and divide by hex area (km²).
 
+    Signals are matched to hexes by H3 cell ID rather than geometry: each
+    point is indexed with ``geo_to_h3`` at the grid resolution and the
+    counts are joined on ``h3_index`` — an integer equality join with no
+    R-tree traversal and no reprojection of the points.
+
     Parameters
     ----------
     hexes:
-        GeoDataFrame of hex polygons in metres CRS.
+        Hex GeoDataFrame with uint64 ``h3_index`` and ``h3_res`` columns.
     signals:
-        GeoDataFrame of point features (signals/stops) in any CRS.
+        GeoDataFrame of point features (signals/stops) in EPSG:4326.
     city:
         For logging only.
+    inv_area_km2:
+        Optional precomputed ``1 / hex_area_km2`` (positional); computed here
+        when omitted.  ``compute_all_metrics`` shares one array across all
+        three metrics.
 
     Returns
     -------
@@ -259,30 +283,29 @@ def compute_signal_density(
 
     if signals.empty:
         logger.warning("[%s] No signal features; signal density set to 0.", city.slug)
-        return pd.Series(0.0, index=hexes.index, name="signal_density_per_km2")
-
-    # Reproject to match hexes
-    if signals.crs != hexes.crs:
-        signals = signals.to_crs(hexes.crs)
-
-    # Keep only point geometries
-    signals = signals[signals.geometry.geom_type == "Point"].copy()
-    if signals.empty:
-        return pd.Series(0.0, index=hexes.index, name="signal_density_per_km2")
-
-    joined = gpd.sjoin(
-        signals[["geometry"]],
-        hexes[["geometry", "hex_area_km2"]],
-        how="inner",
-        predicate="within",
+        return _density_series(0.0, hexes, "signal_density_per_km2")
+
+    # H3 indexes lat/lon, so the points must be WGS-84
+    _require_crs(signals, "EPSG:4326", "signals")
+
+    # Keep only point geometries (type id 0), straight on the geometry array
+    points = signals.geometry.values
+    points = points[shapely.get_type_id(points) == 0]
+    if len(points) == 0 or hexes.empty:
+        return _density_series(0.0, hexes, "signal_density_per_km2")
+
+    h3_res = int(hexes["h3_res"].iloc[0])
+    lonlat = shapely.get_coordinates(points)
+    cells = points_to_cells(lonlat[:, 1], lonlat[:, 0], h3_res)
+
+    # Integer join: position of each signal's cell in the hex table (-1 if
+    # the signal falls outside the grid), then one bincount.
+    pos = pd.Index(hexes["h3_index"].to_numpy()).get_indexer(cells)
+    counts = np.bincount(pos[pos >= 0], minlength=len(hexes))
+    density = _density_series(
+        counts * _inv_area(hexes, inv_area_km2), hexes, "signal_density_per_km2"
     )
 
-    counts = joined.groupby("index_right").size().rename("signal_count")
-    hexes_merged = hexes[["hex_area_km2"]].join(counts, how="left")
-    hexes_merged["signal_count"] = hexes_merged["signal_count"].fillna(0)
-    density = hexes_merged["signal_count"] / hexes_merged["hex_area_km2"]
-    density.name = "signal_density_per_km2"
-
     logger.info(
         "[%s] Signal density: min=%.4f, mean=%.4f, max=%.4f (per km²)",
         city.slug,
@@ -311,14 +334,70 @@ def assemble_metrics(
     hexes:
         Hex GeoDataFrame (projected CRS).
     intersection_density, road_density, signal_density:
-        pd.Series aligned to ``hexes.index``.
+        pd.Series aligned to ``hexes.index`` (reindexed, missing → 0, if not).
 
     Returns
     -------
-    GeoDataFrame with three new metric columns.
+    GeoDataFrame with three new float32 metric columns.
     """
-    result = hexes.copy()
-    result["intersection_density_per_km2"] = intersection_density.reindex(result.index).fillna(0.0)
-    result["road_density_km_per_km2"] = road_density.reindex(result.index).fillna(0.0)
-    result["signal_density_per_km2"] = signal_density.reindex(result.index).fillna(0.0)
+    result = hexes.copy(deep=False)
+    for col, series in (
+        ("intersection_density_per_km2", intersection_density),
+        ("road_density_km_per_km2", road_density),
+        ("signal_density_per_km2", signal_density),
+    ):
+        # The density functions return Series on hexes.index already, so the
+        # reindex/fillna pass is only paid for foreign input.
+        if not series.index.equals(result.index):
+            series = series.reindex(result.index).fillna(0.0)
+        result[col] = series.to_numpy(dtype=np.float32)
     return result
+
+
+def compute_all_metrics(
+    hexes: gpd.GeoDataFrame,
+    intersections: gpd.GeoDataFrame,
+    edges: gpd.GeoDataFrame,
+    signals: gpd.GeoDataFrame,
+    city: CityConfig,
+    hex_tree: shapely.STRtree | None = None,
+) -> gpd.GeoDataFrame:
+    """
+    Compute all three per-hex metrics concurrently and attach them.
+
+    The metrics share only read-only inputs (``hexes`` and the hex STRtree),
+    and their GEOS work (tree queries, clipping, lengths) runs with the GIL
+    released, so a small thread pool overlaps them without pickling anything.
+
+    Parameters
+    ----------
+    hexes:
+        Hex GeoDataFrame (projected CRS).
+    intersections, edges, signals:
+        Inputs for ``compute_intersection_density``, ``compute_road_density``
+        and ``compute_signal_density`` respectively.
+    city:
+        For logging only.
+    hex_tree:
+        Optional STRtree over ``hexes.geometry``; built here when omitted.
+
+    Returns
+    -------
+    GeoDataFrame with three new metric columns (see ``assemble_metrics``).
+    """
+    if hex_tree is None:
+        hex_tree = shapely.STRtree(hexes.geometry.values)
+    inv_area_km2 = _inv_area(hexes, None)
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="metrics") as pool:
+        int_density = pool.submit(
+            compute_intersection_density, hexes, intersections, city, hex_tree, inv_area_km2
+        )
+        road_density = pool.submit(
+            compute_road_density, hexes, edges, city, hex_tree, inv_area_km2
+        )
+        sig_density = pool.submit(compute_signal_density, hexes, signals, city, inv_area_km2)
+
+    return assemble_metrics(
+        hexes, int_density.result(), road_density.result(), sig_density.result()
+    )
@@ -1,8 +1,9 @@
 """
 OSM data acquisition: street networks and point features.
 
-Downloads are cached to disk as GraphML (for graphs) and GeoPackage/Parquet
-(for point features) so that subsequent runs skip the network round-trip.
+Downloads are cached to disk as pickles (for graphs) and GeoParquet (for
+nodes, edges and point features) so that subsequent runs skip the network
+round-trip.
 """
 
 from __future__ import annotations
@@ -14,12 +15,13 @@ from typing import Tuple
 
 import geopandas as gpd
 import networkx as nx
+import numpy as np
 import osmnx as ox
 import pandas as pd
-from shapely.geometry import Point
+import shapely
 
+from urbanicity.cache import cache_path
 from urbanicity.config import (
-    CACHE_DIR,
     NETWORK_TYPE,
     SIGNAL_TAGS,
     CityConfig,
@@ -31,32 +33,116 @@ logger = logging.getLogger(__name__)
 # Internal helpers
 # ---------------------------------------------------------------------------
 
+# Cache files are keyed by everything that shapes the download so that a
+# changed query, network type, or tag set never resolves to a stale file.
+
 def _graph_cache_path(city: CityConfig) -> Path:
-    return CACHE_DIR / f"{city.slug}_graph.graphml"
+    return cache_path(f"{city.slug}_graph", city.osm_query, NETWORK_TYPE, suffix=".pkl")
+
+
+def _graphml_export_path(city: CityConfig) -> Path:
+    return cache_path(
+        f"{city.slug}_graph", city.osm_query, NETWORK_TYPE, suffix=".graphml"
+    )
+
+
+def _save_graph(G: nx.MultiDiGraph, path: Path) -> None:
+    # Pickle rebuilds the adjacency dicts directly; GraphML re-parses XML
+    # and coerces every attribute string, which is 10-50x slower to load.
+    with open(path, "wb") as f:
+        pickle.dump(G, f, protocol=5)
+
+
+def _read_graph(path: Path) -> nx.MultiDiGraph:
+    with open(path, "rb") as f:
+        return pickle.load(f)
 
 
 def _nodes_cache_path(city: CityConfig) -> Path:
-    return CACHE_DIR / f"{city.slug}_nodes.parquet"
+    return cache_path(f"{city.slug}_nodes", city.osm_query, NETWORK_TYPE)
 
 
 def _edges_cache_path(city: CityConfig) -> Path:
-    return CACHE_DIR / f"{city.slug}_edges.parquet"
+    return cache_path(f"{city.slug}_edges", city.osm_query, NETWORK_TYPE)
 
 
 def _signals_cache_path(city: CityConfig) -> Path:
-    return CACHE_DIR / f"{city.slug}_signals.parquet"
+    return cache_path(f"{city.slug}_signals", city.osm_query, SIGNAL_TAGS)
+
+
+def _undirected_degree(G: nx.MultiDiGraph, n: object) -> int:
+    # Degree of *n* in G.to_undirected(): edges u→v and v→u with the same key
+    # collapse into one undirected edge, and a self-loop counts twice.
+    edges = {(v, k) for v, keyed in G.succ[n].items() for k in keyed}
+    edges.update((u, k) for u, keyed in G.pred[n].items() for k in keyed)
+    return len(edges) + sum(1 for v, _ in edges if v == n)
+
+
+_GRAPH_INTERNAL_KEYS = ("_urbanicity_projected", "_node_ids", "_undirected_degree")
+
+
+def _graph_degrees(G: nx.MultiDiGraph) -> Tuple[np.ndarray, np.ndarray]:
+    # (node ids, undirected degrees) in G.nodes order. Stored on G.graph so
+    # they are pickled with the cached graph and the adjacency walk happens
+    # once per download rather than once per run.
+    if "_node_ids" not in G.graph:
+        G.graph["_node_ids"] = np.fromiter(G.nodes, dtype=np.int64, count=len(G))
+        G.graph["_undirected_degree"] = np.fromiter(
+            (_undirected_degree(G, n) for n in G.nodes), dtype=np.int32, count=len(G)
+        )
+    return G.graph["_node_ids"], G.graph["_undirected_degree"]
+
+
+def _write_cached_gdf(
+    gdf: gpd.GeoDataFrame, path: Path, row_group_size: int = 50_000
+) -> None:
+    # Hilbert-ordered rows keep each row group spatially compact, so the
+    # bbox covering column lets readers prune row groups on spatial filters;
+    # native GeoArrow coordinates also decode faster than WKB.
+    # geopandas cannot GeoArrow-encode an empty or all-missing geometry
+    # column (e.g. a city without signals), so those stay WKB.
+    has_geometry = bool(gdf.geometry.notna().any())
+    if has_geometry:
+        gdf = gdf.iloc[np.argsort(gdf.geometry.hilbert_distance(), kind="stable")]
+    gdf.to_parquet(
+        path,
+        compression="zstd",
+        compression_level=3,
+        row_group_size=row_group_size,
+        geometry_encoding="geoarrow" if has_geometry else "WKB",
+        write_covering_bbox=True,
+    )
+
+
+def _is_unprojected(G: nx.MultiDiGraph) -> bool:
+    crs_val = G.graph.get("crs", "")
+    return str(crs_val).upper() in ("EPSG:4326", "WGS 84", "") or "crs" not in G.graph
+
+
+def _project(G: nx.MultiDiGraph) -> nx.MultiDiGraph:
+    # Project to UTM and stamp the graph so cache hits can trust it as-is;
+    # the degree arrays are attached here too, before the graph is pickled.
+    G = ox.project_graph(G)
+    G.graph["_urbanicity_projected"] = True
+    _graph_degrees(G)
+    return G
 
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def load_graph(city: CityConfig, force: bool = False) -> nx.MultiDiGraph:
+def load_graph(
+    city: CityConfig,
+    force: bool = False,
+    export_graphml: bool = False,
+) -> nx.MultiDiGraph:
     """
     Return a projected drivable road graph for *city*.
 
-    The graph is cached as GraphML. On subsequent calls the file is read
-    directly without hitting the OSM Overpass API.
+    The graph is cached as a pickle (the cache is private to this package,
+    so no interchange format is needed). On subsequent calls the file is
+    read directly without hitting the OSM Overpass API.
 
     Parameters
     ----------
@@ -64,32 +150,41 @@ def load_graph(city: CityConfig, force: bool = False) -> nx.MultiDiGraph:
         CityConfig identifying the city to fetch.
     force:
         If True, re-download even if a cache file exists.
+    export_graphml:
+        Also write the projected graph as GraphML next to the cache, for
+        inspection in other tools.
 
     Returns
     -------
     nx.MultiDiGraph
         OSMnx graph projected to an appropriate meters-based UTM CRS.
     """
-    cache_path = _graph_cache_path(city)
-
-    if cache_path.exists() and not force:
-        logger.info("[%s] Loading graph from cache: %s", city.slug, cache_path)
-        G = ox.load_graphml(cache_path)
-        # Ensure the graph has been projected (may already be from a previous run)
-        crs_val = G.graph.get("crs", "")
-        is_wgs84 = str(crs_val).upper() in ("EPSG:4326", "WGS 84", "") or "crs" not in G.graph
-        if is_wgs84:
+    graph_path = _graph_cache_path(city)
+
+    if graph_path.exists() and not force:
+        logger.info("[%s] Loading graph from cache: %s", city.slug, graph_path)
+        G = _read_graph(graph_path)
+        # Graphs cached by load_graph carry the projected marker; only an
+        # unmarked file falls back to inspecting the CRS string.
+        if not G.graph.get("_urbanicity_projected") and _is_unprojected(G):
             logger.info("[%s] Projecting cached graph…", city.slug)
-            G = ox.project_graph(G)
-            ox.save_graphml(G, cache_path)
-        return G
-
-    logger.info("[%s] Downloading OSM graph (%s)…", city.slug, city.osm_query)
-    G = ox.graph_from_place(city.osm_query, network_type=NETWORK_TYPE)
-    logger.info("[%s] Projecting graph to UTM…", city.slug)
-    G = ox.project_graph(G)
-    ox.save_graphml(G, cache_path)
-    logger.info("[%s] Graph cached to %s", city.slug, cache_path)
+            G = _project(G)
+            _save_graph(G, graph_path)
+    else:
+        logger.info("[%s] Downloading OSM graph (%s)…", city.slug, city.osm_query)
+        G = ox.graph_from_place(city.osm_query, network_type=NETWORK_TYPE)
+        logger.info("[%s] Projecting graph to UTM…", city.slug)
+        G = _project(G)
+        _save_graph(G, graph_path)
+        logger.info("[%s] Graph cached to %s", city.slug, graph_path)
+
+    if export_graphml:
+        # The degree arrays are cache internals, not GraphML attributes.
+        internal = {k: G.graph.pop(k) for k in _GRAPH_INTERNAL_KEYS if k in G.graph}
+        try:
+            ox.save_graphml(G, _graphml_export_path(city))
+        finally:
+            G.graph.update(internal)
     return G
 
 
@@ -125,8 +220,10 @@ def load_nodes_edges(
 
     if nodes_path.exists() and edges_path.exists() and not force:
         logger.info("[%s] Loading nodes/edges from cache.", city.slug)
-        nodes = gpd.read_parquet(nodes_path)
-        edges = gpd.read_parquet(edges_path)
+        # Column projection is pushed into the Arrow reader; the osmid
+        # index comes back via the pandas metadata.
+        nodes = gpd.read_parquet(nodes_path, columns=["geometry"])
+        edges = gpd.read_parquet(edges_path, columns=["geometry", "length_m"])
         return nodes, edges
 
     if G is None:
@@ -146,18 +243,28 @@ def load_nodes_edges(
         )
 
     # Rename for clarity and keep only what's needed for metric computation.
-    edges = edges.rename(columns={"length": "length_m"})
-    edges = edges[["geometry", "length_m"]].copy()
+    # (A list selection already returns a new frame; no extra copy needed.)
+    edges = edges.rename(columns={"length": "length_m"})[["geometry", "length_m"]]
 
     # Nodes: index is osmid integers; keep only geometry column.
-    nodes = nodes[["geometry"]].copy()
+    nodes = nodes[["geometry"]]
 
-    nodes.to_parquet(nodes_path)
-    edges.to_parquet(edges_path)
+    _write_cached_gdf(nodes, nodes_path)
+    # Edge rows carry whole linestrings; smaller groups keep them compact.
+    _write_cached_gdf(edges, edges_path, row_group_size=25_000)
     logger.info("[%s] Nodes/edges cached.", city.slug)
     return nodes, edges
 
 
+def is_cached(city: CityConfig) -> bool:
+    """
+    Return True if both the road graph and the signal features for *city*
+    are already on disk, i.e. ``load_graph`` and ``load_signals`` would not
+    touch the network.
+    """
+    return _graph_cache_path(city).exists() and _signals_cache_path(city).exists()
+
+
 def compute_intersection_nodes(
     city: CityConfig,
     G: nx.MultiDiGraph,
@@ -186,12 +293,13 @@ def compute_intersection_nodes(
     GeoDataFrame of intersection nodes, same CRS as *nodes*.
     """
     logger.info("[%s] Computing intersection nodes (degree >= %d)…", city.slug, min_degree)
-    G_undirected = G.to_undirected()
-    degree_series = pd.Series(dict(G_undirected.degree()), name="degree")
-    degree_series.index.name = nodes.index.name  # align index name
-
-    nodes_with_degree = nodes.join(degree_series, how="left")
-    intersections = nodes_with_degree[nodes_with_degree["degree"] >= min_degree].copy()
+    # Degrees come precomputed with the cached graph; align them to the row
+    # order of *nodes* (nodes absent from G count as degree 0).
+    node_ids, graph_degree = _graph_degrees(G)
+    pos = pd.Index(node_ids).get_indexer(nodes.index)
+    degree = np.where(pos >= 0, graph_degree[pos], 0)
+    intersections = nodes[degree >= min_degree].copy()
+    intersections["degree"] = degree[degree >= min_degree]
     logger.info("[%s] Found %d intersection nodes.", city.slug, len(intersections))
     return intersections
 
@@ -203,8 +311,9 @@ def load_signals(city: CityConfig, force: bool = False) -> gpd.GeoDataFrame:
     Data is fetched from OSM via OSMnx ``features_from_place`` and cached as
     Parquet. Returns an empty GeoDataFrame if no features are found.
 
-    The returned GeoDataFrame is in EPSG:4326 (WGS 84); callers must reproject
-    to match the road graph CRS before spatial operations.
+    The returned GeoDataFrame is in EPSG:4326 (WGS 84) and callers must not
+    reproject it: signal density joins points to hexes on H3 cell IDs, and
+    ``compute_signal_density`` raises on signals in any other CRS.
 
     Parameters
     ----------
@@ -217,53 +326,53 @@ def load_signals(city: CityConfig, force: bool = False) -> gpd.GeoDataFrame:
     -------
     GeoDataFrame with point geometry column in EPSG:4326.
     """
-    cache_path = _signals_cache_path(city)
+    signals_path = _signals_cache_path(city)
 
-    if cache_path.exists() and not force:
+    if signals_path.exists() and not force:
         logger.info("[%s] Loading signals from cache.", city.slug)
-        gdf = gpd.read_parquet(cache_path)
+        gdf = gpd.read_parquet(signals_path)
         return gdf
 
     logger.info("[%s] Downloading signal/stop features from OSM…", city.slug)
-    frames = []
 
-    # Query each tag group separately — OSMnx features_from_place takes a
-    # dict of {tag_key: tag_value_or_list} and returns all matched features.
+    # OSMnx features_from_place takes a dict of {tag_key: tag_value_or_list}
+    # and returns all matched features in a single frame.
+    raw = None
     try:
-        gdf_all = ox.features_from_place(city.osm_query, tags=SIGNAL_TAGS)
-        if len(gdf_all) > 0:
-            frames.append(gdf_all)
+        raw = ox.features_from_place(city.osm_query, tags=SIGNAL_TAGS)
     except Exception as exc:
         logger.warning("[%s] Signal feature download failed: %s", city.slug, exc)
 
-    if not frames:
+    if raw is None or len(raw) == 0:
         logger.warning("[%s] No signal features found; using empty GeoDataFrame.", city.slug)
         empty = gpd.GeoDataFrame(geometry=gpd.GeoSeries([], dtype="geometry"), crs="EPSG:4326")
-        empty.to_parquet(cache_path)
+        _write_cached_gdf(empty, signals_path)
         return empty
 
-    gdf = pd.concat(frames, ignore_index=True)
-
     # Normalise: ensure every row has a Point geometry.
-    # OSM may return ways/polygons for traffic signals; use representative point.
-    def _to_point(geom):
-        if geom is None:
-            return None
-        if geom.geom_type == "Point":
-            return geom
-        return geom.representative_point()
-
-    gdf["geometry"] = gdf["geometry"].apply(_to_point)
-    gdf = gdf[gdf["geometry"].notna()].copy()
-    gdf = gpd.GeoDataFrame(gdf, geometry="geometry", crs="EPSG:4326")
-
-    # Keep only essential columns
-    keep_cols = ["geometry"]
-    for col in ["highway", "crossing", "osmid"]:
-        if col in gdf.columns:
-            keep_cols.append(col)
-    gdf = gdf[keep_cols].copy()
-
-    gdf.to_parquet(cache_path)
+    # OSM may return ways/polygons for traffic signals; use representative
+    # point. Missing geometries (type id -1) stay None and are dropped below.
+    geoms = raw.geometry.to_numpy()
+    non_point = shapely.get_type_id(geoms) > 0
+    points = geoms.copy()
+    points[non_point] = shapely.representative_point(geoms[non_point])
+
+    # Keep only the tag columns, assembled straight from the source columns
+    # so the wide OSM attribute table is never copied. The (element, id)
+    # index OSMnx returns is replaced by a plain RangeIndex; nothing
+    # downstream needs the OSM ids. The tags have a handful of distinct
+    # values, so they are stored as categoricals (dictionary-encoded in
+    # Parquet).
+    keep = {
+        c: pd.Categorical(raw[c].to_numpy()) for c in ("highway", "crossing") if c in raw.columns
+    }
+    gdf = gpd.GeoDataFrame(
+        {**keep, "geometry": points},
+        geometry="geometry",
+        crs="EPSG:4326",
+    )
+    gdf = gdf[gdf["geometry"].notna()]
+
+    _write_cached_gdf(gdf, signals_path)
     logger.info("[%s] Cached %d signal features.", city.slug, len(gdf))
     return gdf
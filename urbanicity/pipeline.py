@@ -8,6 +8,7 @@ Called by the CLI (cli.py) and importable directly for programmatic use.
 from __future__ import annotations
 
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, Tuple
 
 import geopandas as gpd
@@ -19,24 +20,22 @@ from urbanicity.config import (
     DEFAULT_SIGNAL_MODE,
     FIELD_SEMANTICS,
     INTERSECTION_MIN_DEGREE,
+    OUTPUT_DTYPES,
     QUANTILE_HIGH,
     QUANTILE_LOW,
 )
 from urbanicity.h3grid import (
     build_hex_geodataframe,
+    build_hex_index,
     get_city_boundary,
     get_graph_crs,
     polyfill_boundary,
 )
-from urbanicity.io import write_geojson, write_parquet, write_summary, write_thresholds
-from urbanicity.metrics import (
-    assemble_metrics,
-    compute_intersection_density,
-    compute_road_density,
-    compute_signal_density,
-)
+from urbanicity.io import write_geometry, write_parquet, write_summary, write_thresholds
+from urbanicity.metrics import compute_all_metrics
 from urbanicity.osm import (
     compute_intersection_nodes,
+    is_cached,
     load_graph,
     load_nodes_edges,
     load_signals,
@@ -47,6 +46,33 @@ from urbanicity.validate import UrbanicityValidationError, validate_city_output
 logger = logging.getLogger(__name__)
 
 
+def prefetch_city(city: CityConfig, force: bool = False) -> None:
+    """
+    Populate the on-disk caches for *city* without computing anything.
+
+    This is the network-bound stage of ``run_city`` (road graph, nodes/edges,
+    signal features, geocoded boundary). Running it ahead of time lets the
+    CLI overlap downloads for one city with the CPU-bound stages of another;
+    the subsequent ``run_city(force=False)`` then reads everything from cache.
+    Nothing is returned so that no large objects outlive the call.
+    """
+    logger.info("[%s] Prefetching OSM data…", city.slug)
+    G = load_graph(city, force=force)
+    nodes, _ = load_nodes_edges(city, G=G, force=force)
+    load_signals(city, force=force)
+    get_city_boundary(city, nodes, force=force)
+    logger.info("[%s] Prefetch complete.", city.slug)
+
+
+def _load_signals_async(city: CityConfig) -> Future:
+    # Cache-only read in a background thread; shutting the pool down without
+    # waiting lets the submitted read finish while the caller carries on.
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{city.slug}-signals")
+    future = pool.submit(load_signals, city)
+    pool.shutdown(wait=False)
+    return future
+
+
 def run_city(
     city: CityConfig,
     h3_res: int = DEFAULT_H3_RES,
@@ -56,7 +82,10 @@ def run_city(
     q_low: float = QUANTILE_LOW,
     q_high: float = QUANTILE_HIGH,
     emit_geojson: bool = True,
+    geometry_format: str = "parquet",
     force: bool = False,
+    exact_area: bool = False,
+    refresh_cells: bool = False,
 ) -> gpd.GeoDataFrame:
     """
     Execute the full urbanicity pipeline for a single city.
@@ -76,9 +105,19 @@ def run_city(
     q_low / q_high:
         Quantile thresholds for band discretization (default 0.30 / 0.70).
     emit_geojson:
-        Write a GeoJSON file in addition to Parquet.
+        Write the hex geometry layer in addition to the attribute Parquet.
+    geometry_format:
+        Format of the geometry layer: ``"parquet"`` (GeoParquet), ``"fgb"``
+        (FlatGeobuf) or ``"geojson"``.
     force:
-        Re-download OSM data even if cache files exist.
+        Re-download OSM data and re-geocode the boundary even if cache files
+        exist.
+    exact_area:
+        Use planar projected hex areas instead of H3's mean hexagon area.
+    refresh_cells:
+        Recompute the H3 polyfill even if its cache file exists, without
+        re-downloading anything. Implied by *force*; the CLI sets it when
+        a prefetch stage has already refreshed the downloads.
 
     Returns
     -------
@@ -91,6 +130,11 @@ def run_city(
     # ------------------------------------------------------------------
     # Step 1 — OSM drivable road graph
     # ------------------------------------------------------------------
+    # With warm caches Steps 1–2 and 4 are pure disk reads (Parquet decoding
+    # releases the GIL), so the signal read overlaps the graph load. Cold
+    # caches stay sequential: Overpass serialises requests per client IP.
+    signals_future = _load_signals_async(city) if not force and is_cached(city) else None
+
     logger.info("[%s] Step 1 — Loading road graph…", city.slug)
     G = load_graph(city, force=force)
     graph_crs = get_graph_crs(G)
@@ -114,15 +158,23 @@ def run_city(
     # Step 4 — Signal / stop features
     # ------------------------------------------------------------------
     logger.info("[%s] Step 4 — Loading signal features…", city.slug)
-    signals_wgs84 = load_signals(city, force=force)
-    signals = signals_wgs84.to_crs(graph_crs) if not signals_wgs84.empty else signals_wgs84
+    # Kept in WGS-84: signal density joins on H3 cell IDs, not geometry
+    if signals_future is not None:
+        signals = signals_future.result()
+    else:
+        signals = load_signals(city, force=force)
 
     # ------------------------------------------------------------------
     # Step 5 — City boundary + H3 polyfill
     # ------------------------------------------------------------------
     logger.info("[%s] Step 5 — Generating H3 hex grid (res=%d)…", city.slug, h3_res)
-    boundary_wgs84 = get_city_boundary(city, nodes)
-    h3_indices = polyfill_boundary(boundary_wgs84, h3_res=h3_res, buffer_m=buffer_m)
+    boundary_wgs84 = get_city_boundary(city, nodes, force=force)
+    h3_indices = polyfill_boundary(
+        boundary_wgs84,
+        h3_res=h3_res,
+        buffer_m=buffer_m,
+        force=force or refresh_cells,
+    )
     logger.info("[%s] H3 polyfill: %d hexes", city.slug, len(h3_indices))
 
     hexes = build_hex_geodataframe(
@@ -130,16 +182,16 @@ def run_city(
         h3_res=h3_res,
         city=city,
         projected_crs=graph_crs,
+        exact_area=exact_area,
     )
 
     # ------------------------------------------------------------------
     # Step 6 — Per-hex metric computation
     # ------------------------------------------------------------------
     logger.info("[%s] Step 6 — Computing per-hex metrics…", city.slug)
-    int_density  = compute_intersection_density(hexes, intersections, city)
-    road_density = compute_road_density(hexes, edges, city)
-    sig_density  = compute_signal_density(hexes, signals, city)
-    hexes = assemble_metrics(hexes, int_density, road_density, sig_density)
+    hexes = compute_all_metrics(
+        hexes, intersections, edges, signals, city, hex_tree=build_hex_index(hexes)
+    )
 
     # ------------------------------------------------------------------
     # Step 7 — Normalize + composite score + bands
@@ -155,6 +207,9 @@ def run_city(
     # ------------------------------------------------------------------
     hexes["field_semantics"] = FIELD_SEMANTICS
 
+    # Downcast once scoring is done (halves memory and Parquet size)
+    hexes = hexes.astype({c: t for c, t in OUTPUT_DTYPES.items() if c in hexes.columns})
+
     # ------------------------------------------------------------------
     # Step 9 — Validation
     # ------------------------------------------------------------------
@@ -172,11 +227,20 @@ def run_city(
     # Step 10 — Write outputs
     # ------------------------------------------------------------------
     logger.info("[%s] Step 10 — Writing outputs…", city.slug)
-    write_parquet(hexes, city)
-    write_thresholds(hexes, city, h3_res=h3_res)
-    write_summary(hexes, city)
-    if emit_geojson:
-        write_geojson(hexes, city)
+    # The geometry layer (polygon rebuild + serialisation, GIL released in
+    # h3/shapely/pyogrio) is the slowest sink; the sinks only read hexes, so
+    # it runs alongside the attribute Parquet and JSON sidecars.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        geometry_future = (
+            pool.submit(write_geometry, hexes, city, fmt=geometry_format)
+            if emit_geojson
+            else None
+        )
+        write_parquet(hexes, city)
+        write_thresholds(hexes, city, h3_res=h3_res)
+        write_summary(hexes, city)
+        if geometry_future is not None:
+            geometry_future.result()
 
     logger.info("[%s] Pipeline complete.", city.name)
     return hexes
@@ -42,11 +42,25 @@ from urbanicity.config import (
 
 logger = logging.getLogger(__name__)
 
+_DENSITY_COLS = (
+    "intersection_density_per_km2",
+    "road_density_km_per_km2",
+    "signal_density_per_km2",
+)
+
 
 # ---------------------------------------------------------------------------
 # Robust z-score
 # ---------------------------------------------------------------------------
 
+def _zeros_like(series: pd.Series, dtype: np.dtype) -> pd.Series:
+    # np.zeros is calloc-backed (zero pages mapped lazily) and is wrapped
+    # without a copy, unlike the scalar-broadcast Series constructor.
+    return pd.Series(
+        np.zeros(len(series), dtype=dtype), index=series.index, name=series.name, copy=False
+    )
+
+
 def robust_zscore(series: pd.Series) -> pd.Series:
     """
     Compute a robust z-score: Z(x) = (x − median) / (MAD + eps).
@@ -62,20 +76,36 @@ def robust_zscore(series: pd.Series) -> pd.Series:
 
     Returns
     -------
-    pd.Series of robust z-scores, clamped to [-10, 10].
+    pd.Series of robust z-scores, clamped to [-10, 10], in the input's
+    float dtype (float64 for non-float input).
     """
-    median = series.median()
-    mad = (series - median).abs().median()
+    # Plain ndarray arithmetic: one buffer for the deviations and one for z
+    # (reused in place), no per-step Series allocation or index alignment.
+    # The nan-aware reductions keep pandas' skipna semantics. Float input
+    # keeps its dtype (float32 densities score in float32); anything else
+    # is promoted to float64.
+    x = series.to_numpy()
+    if x.dtype.kind != "f":
+        x = x.astype(np.float64)
+    # All-zero column (e.g. no signals at all): every statistic is 0, so
+    # skip the reductions. NaN is truthy, so NaN-bearing input never lands here.
+    if not x.any():
+        return _zeros_like(series, x.dtype)
+
+    median = np.nanmedian(x)
+    mad = np.nanmedian(np.abs(x - median))
 
     if mad < MAD_EPS:
-        scale = series.std(ddof=0)
+        scale = np.nanstd(x)
         if scale < MAD_EPS:
-            return pd.Series(0.0, index=series.index, name=series.name)
+            return _zeros_like(series, x.dtype)
     else:
         scale = mad
 
-    z = (series - median) / (scale + MAD_EPS)
-    return z.clip(lower=-10.0, upper=10.0)
+    z = x - median
+    z /= scale + MAD_EPS
+    np.clip(z, -10.0, 10.0, out=z)
+    return pd.Series(z, index=series.index, name=series.name)
 
 
 # ---------------------------------------------------------------------------
@@ -84,7 +114,8 @@ def robust_zscore(series: pd.Series) -> pd.Series:
 
 def _signal_fraction(gdf: gpd.GeoDataFrame) -> float:
     """Return the fraction of hexes that contain ≥1 signal/stop feature."""
-    return (gdf["signal_density_per_km2"] > 0).mean()
+    sig = gdf["signal_density_per_km2"].to_numpy()
+    return float(np.count_nonzero(sig > 0) / sig.size) if sig.size else 0.0
 
 
 def _should_use_signals(
@@ -119,7 +150,7 @@ def _should_use_signals(
 
     # auto: apply 5% sparsity rule
     frac = _signal_fraction(gdf)
-    use = frac >= SIGNAL_SPARSITY_THRESHOLD
+    use = bool(frac >= SIGNAL_SPARSITY_THRESHOLD)
     logger.info(
         "[%s] signal_mode=auto: %.1f%% of hexes have ≥1 signal → %s.",
         city.slug,
@@ -162,7 +193,15 @@ def compute_urbanicity_score(
     ``z_signal_density`` (NaN when dropped),
     ``urbanicity_score_continuous``.
     """
-    result = gdf.copy()
+    # Shallow copy: the new columns land on *result* only, while the existing
+    # columns (geometry above all) are shared with *gdf* instead of duplicated.
+    result = gdf.copy(deep=False)
+
+    # Score in float32: the densities come out of assemble_metrics as
+    # float32 already (no-op then), and z-scores inherit the input dtype,
+    # which halves the bytes streamed by every scoring pass.
+    for col in _DENSITY_COLS:
+        result[col] = result[col].astype(np.float32, copy=False)
 
     # Resolve base weights
     if weights is not None:
@@ -170,17 +209,18 @@ def compute_urbanicity_score(
     else:
         w_int_base, w_road_base, w_sig_base = W_INTERSECTION, W_ROAD, W_SIGNAL
 
-    # Compute z-scores for all three metrics
+    # Compute z-scores for intersection and road density
     result["z_intersection_density"] = robust_zscore(
         result["intersection_density_per_km2"]
     )
     result["z_road_density"] = robust_zscore(result["road_density_km_per_km2"])
-    result["z_signal_density"] = robust_zscore(result["signal_density_per_km2"])
 
-    # Decide whether to use signals
+    # Decide whether to use signals before normalising them: a dropped
+    # signal column is overwritten with NaN, so its z-score is never needed.
     use_signal = _should_use_signals(result, signal_mode, city)
 
     if use_signal:
+        result["z_signal_density"] = robust_zscore(result["signal_density_per_km2"])
         w_int  = w_int_base
         w_road = w_road_base
         w_sig  = w_sig_base
@@ -200,11 +240,10 @@ def compute_urbanicity_score(
             city.slug, w_int, w_road,
         )
 
-    result["urbanicity_score_continuous"] = (
-        w_int  * result["z_intersection_density"]
-        + w_road * result["z_road_density"]
-        + w_sig  * result["z_signal_density"].fillna(0.0)
-    )
+    score = w_int * result["z_intersection_density"] + w_road * result["z_road_density"]
+    if use_signal:
+        score = score + w_sig * result["z_signal_density"].fillna(0.0)
+    result["urbanicity_score_continuous"] = score
 
     # Store effective weights for downstream reporting
     result.attrs["w_int_eff"]  = w_int
@@ -261,7 +300,7 @@ def assign_urbanicity_band(
     -------
     GeoDataFrame with band and threshold columns added.
     """
-    result = gdf.copy()
+    result = gdf.copy(deep=False)
     scores = result["urbanicity_score_continuous"]
 
     t_high = float(scores.quantile(q_high))
@@ -272,21 +311,25 @@ def assign_urbanicity_band(
         city.slug, t_low, q_low * 100, t_high, q_high * 100,
     )
 
-    def _band(score: float) -> int:
-        if score >= t_high:
-            return 3
-        if score <= t_low:
-            return 1
-        return 2
-
-    result["urbanicity_band_3_2_1"] = scores.apply(_band).astype("int8")
+    # Vectorised: default 2, then ≤ T_low → 1, then ≥ T_high → 3 (applied
+    # last so it wins when T_low == T_high).  NaN scores compare False both
+    # ways and stay in band 2.
+    arr = scores.to_numpy()
+    bands = np.full(arr.shape[0], 2, dtype=np.int8)
+    bands[arr <= t_low] = 1
+    bands[arr >= t_high] = 3
+    result["urbanicity_band_3_2_1"] = bands
     result["t_low_q30"]  = t_low
     result["t_high_q70"] = t_high
+    # Scalar copies for writers (the columns are downcast to float32 later)
+    result.attrs["t_low_q30"]  = t_low
+    result.attrs["t_high_q70"] = t_high
 
-    band_counts = result["urbanicity_band_3_2_1"].value_counts().sort_index()
+    # One counting pass over the int8 codes (no hash table, no sort)
+    band_counts = np.bincount(bands, minlength=4)
     logger.info(
-        "[%s] Band distribution:\n%s",
+        "[%s] Band distribution: 1=%d  2=%d  3=%d",
         city.slug,
-        band_counts.to_string(),
+        band_counts[1], band_counts[2], band_counts[3],
     )
     return result
@@ -8,123 +8,257 @@ Raises ``UrbanicityValidationError`` listing all failed checks if any fail.
 from __future__ import annotations
 
 import logging
-from typing import List
+import math
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
 import numpy as np
 import geopandas as gpd
 
 logger = logging.getLogger(__name__)
 
+# Columns read by the E1 checks
+_DENSITY_COLS = (
+    "intersection_density_per_km2",
+    "road_density_km_per_km2",
+    "signal_density_per_km2",
+)
+_BAND_COL = "urbanicity_band_3_2_1"
+_SCORE_COL = "urbanicity_score_continuous"
+_ZSIG_COL = "z_signal_density"
+_CHECKED_COLS = (*_DENSITY_COLS, _BAND_COL, _SCORE_COL, _ZSIG_COL)
+# (check id, density column, label) for the ≥30% coverage checks
+_COVERAGE_CHECKS = (
+    ("E1.6", "intersection_density_per_km2", "intersection_density"),
+    ("E1.7", "road_density_km_per_km2", "road_density"),
+)
+
 
 class UrbanicityValidationError(Exception):
     """Raised when one or more acceptance checks fail."""
 
 
-def validate_city_output(gdf: gpd.GeoDataFrame, city_slug: str) -> None:
+@dataclass
+class _ScanCounts:
+    """Counters gathered in one scan over the columns the E1 checks read."""
+
+    n_rows: int
+    # density column → number of values < 0 / > 0
+    n_neg: Dict[str, int] = field(default_factory=dict)
+    n_pos: Dict[str, int] = field(default_factory=dict)
+    # None when the column is absent (the check is then skipped)
+    bad_bands: Optional[np.ndarray] = None
+    n_finite_score: Optional[int] = None
+    z_sig_has_values: Optional[bool] = None
+
+
+def _invalid_bands(band: np.ndarray) -> np.ndarray:
+    """Return the sorted distinct values of *band* outside {1, 2, 3}."""
+    if band.dtype.kind in "iu":
+        # Integer bands (int8 as written by scoring): two allocation-free
+        # reductions settle the valid case; only otherwise is a mask built.
+        if band.size == 0 or (band.min() >= 1 and band.max() <= 3):
+            return band[:0]
+        bad_mask = (band < 1) | (band > 3)
+    else:
+        # Floats/objects: isin also flags NaN, which a range test would miss.
+        bad_mask = ~np.isin(band, (1, 2, 3))
+    return np.unique(band[bad_mask])
+
+
+def _neg_pos(arr: np.ndarray) -> Tuple[int, int]:
+    """Return the counts of values < 0 and > 0 in *arr*."""
+    # Densities are never negative in practice, and min() neither allocates
+    # nor lets NaN through (it propagates). Once min >= 0 holds, every
+    # non-zero value is positive, so both counts come from mask-free
+    # reductions.
+    if arr.size == 0:
+        return 0, 0
+    if arr.dtype.kind in "ub":
+        # Unsigned/bool: negatives are impossible by dtype, skip the min()
+        return 0, int(np.count_nonzero(arr))
+    if arr.min() >= 0:
+        return 0, int(np.count_nonzero(arr))
+    return int(np.count_nonzero(arr < 0)), int(np.count_nonzero(arr > 0))
+
+
+def _count_finite(arr: np.ndarray) -> int:
+    """Return the number of finite values in *arr*."""
+    if arr.dtype.kind in "iub":
+        # Integer/bool dtypes cannot hold NaN or ±inf
+        return arr.size
+    # Any NaN or ±inf poisons the sum, so a finite sum (one allocation-free
+    # reduction) proves the whole column finite, which is the normal case.
+    # Only otherwise, or if the sum itself overflowed, is the mask built.
+    if np.isfinite(arr.sum()):
+        return arr.size
+    return int(np.count_nonzero(np.isfinite(arr)))
+
+
+def _has_non_nan(arr: np.ndarray) -> bool:
+    """Return True if *arr* holds at least one non-NaN value."""
+    # E1.5 only needs "any value" / "all NaN", not a count. A NaN-free sum
+    # settles it with no mask (signals kept); otherwise, e.g. the all-NaN
+    # column of dropped signals, a single isnan pass decides.
+    if arr.size == 0:
+        return False
+    if not np.isnan(arr.sum()):
+        return True
+    return not np.isnan(arr).all()
+
+
+def _column_arrays(
+    gdf: gpd.GeoDataFrame, names: Tuple[str, ...], have: FrozenSet[str]
+) -> Dict[str, np.ndarray]:
     """
-    Run all E1 acceptance checks against a completed city GeoDataFrame.
+    Return ``{name: ndarray}`` for the *names* present in *gdf* (*have*).
 
-    Checks
-    ------
-    E1.1  Non-empty hex set.
-    E1.2  No negative values in density columns.
-    E1.3  ``urbanicity_band_3_2_1`` values are in {1, 2, 3}.
-    E1.4  ``urbanicity_score_continuous`` is finite for >99% of rows.
-    E1.5  If signals were dropped, ``z_signal_density`` is all-NaN and
-          effective signal weight is 0.
-    E1.6  Reasonable coverage: intersection_density > 0 for ≥30% of hexes.
-    E1.7  Reasonable coverage: road_density > 0 for ≥30% of hexes.
+    Each column is resolved through the frame once (no copy for numeric
+    columns); the scan then works on bare arrays with numpy ufuncs, free of
+    pandas' per-access column lookup and Series wrapping.
+    """
+    return {c: gdf[c].to_numpy(copy=False) for c in names if c in have}
 
-    Parameters
-    ----------
-    gdf:
-        Completed city GeoDataFrame (as returned by ``run_city``).
-    city_slug:
-        City identifier used in log / error messages.
 
-    Raises
-    ------
-    UrbanicityValidationError
-        If any check fails.  All failures are collected and reported together.
+def _scan_columns(
+    n_rows: int,
+    arrs: Dict[str, np.ndarray],
+) -> _ScanCounts:
+    """
+    Reduce every checked column to a few integer counters.
+
+    All reductions on a column are taken together (the negative and
+    positive counts of a density column share one read), so the checks
+    compare plain integers instead of building pandas masks per check.
+    """
+    counts = _ScanCounts(n_rows=n_rows)
+    for col in _DENSITY_COLS:
+        if col in arrs:
+            counts.n_neg[col], counts.n_pos[col] = _neg_pos(arrs[col])
+    if _BAND_COL in arrs:
+        counts.bad_bands = _invalid_bands(arrs[_BAND_COL])
+    if _SCORE_COL in arrs:
+        counts.n_finite_score = _count_finite(arrs[_SCORE_COL])
+    if _ZSIG_COL in arrs:
+        counts.z_sig_has_values = _has_non_nan(arrs[_ZSIG_COL])
+    return counts
+
+
+def _validate_arrays(
+    n_rows: int,
+    arrs: Dict[str, np.ndarray],
+    signals_used: Optional[bool] = None,
+    w_sig_eff: Optional[float] = None,
+) -> List[str]:
+    """
+    Run the E1 checks on bare column arrays and return the failure messages.
+
+    This is the frame-free core of ``validate_city_output``: *arrs* maps
+    column names to ndarrays (absent columns skip their checks) and
+    *signals_used* / *w_sig_eff* are the scoring attrs. Batch
+    callers that already hold the arrays can call it without building a
+    GeoDataFrame.
     """
     failures: List[str] = []
+    fail = failures.append  # bound once, not looked up per failure
+    counts = _scan_columns(n_rows, arrs)
 
     # E1.1 — Non-empty
-    if len(gdf) == 0:
-        failures.append("E1.1: Hex set is empty.")
+    if counts.n_rows == 0:
+        fail("E1.1: Hex set is empty.")
 
     # E1.2 — No negative densities
-    for col in [
-        "intersection_density_per_km2",
-        "road_density_km_per_km2",
-        "signal_density_per_km2",
-    ]:
-        if col in gdf.columns:
-            n_neg = int((gdf[col] < 0).sum())
-            if n_neg > 0:
-                failures.append(f"E1.2: {n_neg} negative value(s) in '{col}'.")
+    for col, n_neg in counts.n_neg.items():
+        if n_neg > 0:
+            fail(f"E1.2: {n_neg} negative value(s) in '{col}'.")
 
     # E1.3 — Band values in {1, 2, 3}
-    band_col = "urbanicity_band_3_2_1"
-    if band_col in gdf.columns:
-        bad_bands = gdf[~gdf[band_col].isin([1, 2, 3])][band_col].unique()
-        if len(bad_bands) > 0:
-            failures.append(f"E1.3: Invalid band values found: {sorted(bad_bands)}.")
+    if counts.bad_bands is not None and len(counts.bad_bands) > 0:
+        fail(
+            f"E1.3: Invalid band values found: {counts.bad_bands.tolist()}."
+        )
 
     # E1.4 — Score finiteness >99%
-    score_col = "urbanicity_score_continuous"
-    if score_col in gdf.columns:
-        finite_pct = float(np.isfinite(gdf[score_col]).mean())
+    if counts.n_finite_score is not None and counts.n_rows > 0:
+        finite_pct = counts.n_finite_score / counts.n_rows
         if finite_pct < 0.99:
-            failures.append(
+            fail(
                 f"E1.4: Only {finite_pct:.1%} of scores are finite (need >99%)."
             )
 
     # E1.5 — Signal consistency
-    signals_used = gdf.attrs.get("signals_used")
-    z_sig_col = "z_signal_density"
     if signals_used is False:
         # z_signal_density must be all-NaN
-        if z_sig_col in gdf.columns and gdf[z_sig_col].notna().any():
-            failures.append(
+        if counts.z_sig_has_values:
+            fail(
                 "E1.5: signals_used=False but z_signal_density has non-NaN values."
             )
-        w_sig_eff = gdf.attrs.get("w_sig_eff", None)
-        if w_sig_eff is not None and abs(w_sig_eff) > 1e-9:
-            failures.append(
+        if w_sig_eff is not None and not math.isclose(w_sig_eff, 0.0, abs_tol=1e-9):
+            fail(
                 f"E1.5: signals_used=False but w_sig_eff={w_sig_eff:.4f} (expected 0)."
             )
     elif signals_used is True:
         # z_signal_density must NOT be all-NaN
-        if z_sig_col in gdf.columns and gdf[z_sig_col].isna().all():
-            failures.append(
+        if counts.z_sig_has_values is False:
+            fail(
                 "E1.5: signals_used=True but z_signal_density is all-NaN."
             )
 
-    # E1.6 — Reasonable intersection coverage
-    int_col = "intersection_density_per_km2"
-    if int_col in gdf.columns and len(gdf) > 0:
-        pct_pos = float((gdf[int_col] > 0).mean())
-        if pct_pos < 0.30:
-            failures.append(
-                f"E1.6: Only {pct_pos:.1%} of hexes have intersection_density > 0 "
-                f"(need ≥30%)."
-            )
+    # E1.6 / E1.7 — Reasonable intersection and road coverage
+    for check, col, label in _COVERAGE_CHECKS:
+        if col in counts.n_pos and counts.n_rows > 0:
+            pct_pos = counts.n_pos[col] / counts.n_rows
+            if pct_pos < 0.30:
+                fail(
+                    f"{check}: Only {pct_pos:.1%} of hexes have {label} > 0 "
+                    f"(need ≥30%)."
+                )
 
-    # E1.7 — Reasonable road coverage
-    road_col = "road_density_km_per_km2"
-    if road_col in gdf.columns and len(gdf) > 0:
-        pct_pos = float((gdf[road_col] > 0).mean())
-        if pct_pos < 0.30:
-            failures.append(
-                f"E1.7: Only {pct_pos:.1%} of hexes have road_density > 0 "
-                f"(need ≥30%)."
-            )
+    return failures
+
+
+def validate_city_output(gdf: gpd.GeoDataFrame, city_slug: str) -> None:
+    """
+    Run all E1 acceptance checks against a completed city GeoDataFrame.
+
+    Checks
+    ------
+    E1.1  Non-empty hex set.
+    E1.2  No negative values in density columns.
+    E1.3  ``urbanicity_band_3_2_1`` values are in {1, 2, 3}.
+    E1.4  ``urbanicity_score_continuous`` is finite for >99% of rows.
+    E1.5  If signals were dropped, ``z_signal_density`` is all-NaN and
+          effective signal weight is 0.
+    E1.6  Reasonable coverage: intersection_density > 0 for ≥30% of hexes.
+    E1.7  Reasonable coverage: road_density > 0 for ≥30% of hexes.
+
+    Parameters
+    ----------
+    gdf:
+        Completed city GeoDataFrame (as returned by ``run_city``).
+    city_slug:
+        City identifier used in log / error messages.
+
+    Raises
+    ------
+    UrbanicityValidationError
+        If any check fails.  All failures are collected and reported together.
+    """
+    # One hash-set build instead of a pandas Index probe per name
+    have = frozenset(gdf.columns)
+    attrs = gdf.attrs
+    failures = _validate_arrays(
+        len(gdf),
+        _column_arrays(gdf, _CHECKED_COLS, have),
+        signals_used=attrs.get("signals_used"),
+        w_sig_eff=attrs.get("w_sig_eff"),
+    )
 
     # Report
     if failures:
-        msg = f"[{city_slug}] Validation failed ({len(failures)} issue(s)):\n" + "\n".join(
-            f"  {f}" for f in failures
+        msg = (
+            f"[{city_slug}] Validation failed ({len(failures)} issue(s)):\n  "
+            + "\n  ".join(failures)
         )
         logger.error(msg)
         raise UrbanicityValidationError(msg)